@@ -1,28 +1,493 @@
 # ai.py
 import random
 import math
+import time
+from dataclasses import dataclass, field
 import numpy as np
-from game import Connect4Game, ROWS, COLS
+from game import DEFAULT_SPEC
+from game import ANTI_DIAGONAL
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from book import OpeningBook
+from evaluation import IncrementalEvaluator, BatchEvaluator, WIN_SCORE, pattern_index, pattern_tables
+
+# كل كم عقدة نفحص الوقت
+TIME_CHECK_INTERVAL = 1024
+
+# أولويات ترتيب الحركات (جدول التاريخ أقل منها دائماً)
+TT_MOVE_PRIORITY = 1 << 50
+WIN_PRIORITY = 1 << 48
+BLOCK_PRIORITY = 1 << 46
+KILLER_PRIORITY = 1 << 44
+
+# نصف عرض نافذة الطموح حول قيمة التكرار بنفس الزوجية (depth - 2): قيمة الجذر
+# تتأرجح بالمئات بين العمق الفردي والزوجي، لكنها قريبة بين عمقين بنفس الزوجية
+ASPIRATION_WINDOW = 300
+# معامل توسيع النافذة من جهة الفشل قبل إعادة البحث
+ASPIRATION_GROWTH = 4
+
+
+class SearchTimeout(Exception):
+    """انتهى الوقت المخصص أثناء تكرار البحث"""
+
+
+@dataclass
+class SearchStats:
+    """إحصاءات آخر حركة (engine.last_stats)
+
+    source: "search" أو "book" أو "ponder" أو "solver" أو "mcts"، أو "rule"
+    (فوز فوري أو منع فوز أو قاعدة مستوى) و"random" (حركة عشوائية) بدون بحث.
+    القيمة من منظور المحرك.
+    """
+    move: int = None
+    score: float = None
+    depth: int = 0
+    nodes: int = 0
+    nodes_per_depth: list = field(default_factory=list)
+    helper_nodes: int = 0
+    time: float = 0.0
+    nps: float = 0.0
+    branching_factor: float = 0.0
+    cutoffs: int = 0
+    cutoff_rate: float = 0.0
+    first_move_cutoff_rate: float = 0.0
+    tt_probes: int = 0
+    tt_hits: int = 0
+    eval_calls: int = 0
+    pv: list = field(default_factory=list)
+    source: str = "search"
+    
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+    
+    def summary(self):
+        """سطر واحد للسجلات"""
+        return (f"{self.source} move={self.move} score={self.score} depth={self.depth} "
+                f"nodes={self.nodes} nps={self.nps:.0f} time={self.time:.3f}s "
+                f"ebf={self.branching_factor:.2f} cut={self.cutoff_rate:.1%} "
+                f"first={self.first_move_cutoff_rate:.1%} tt={self.tt_hit_rate:.1%} "
+                f"evals={self.eval_calls} pv={self.pv}")
 
 class MinimaxAlphaBeta:
     """الفئة الأساسية لخوارزمية Minimax مع Alpha-Beta Pruning"""
     
-    def __init__(self, player, depth, c_param=1.41):
+    # عدادات البحث الأخير ونتائجه: تصفر قبل كل بحث، والتفكير يعيدها بعده كما كانت
+    SEARCH_STATE = ("nodes_evaluated", "completed_depth", "cutoffs", "first_move_cutoffs",
+                    "helper_nodes", "eval_calls", "worker_tt_probes", "worker_tt_hits",
+                    "depth_nodes", "best_score")
+    
+    def __init__(self, player, depth, c_param=1.41, spec=None, tt_size_mb=16, seed=None,
+                 batch_leaves=False, workers=1, parallel="root", book=None, stats=True):
+        if parallel not in ("root", "lazy_smp"):
+            raise ValueError(f"unknown parallel mode: {parallel!r}")
+        self.spec = DEFAULT_SPEC if spec is None else spec
+        # كتاب افتتاح اختياري (OpeningBook أو مسار ملفه) يستشار قبل البحث
+        self.book = OpeningBook(book) if isinstance(book, str) else book
+        if self.book is not None and self.book.spec != self.spec:
+            raise ValueError(f"book uses {self.book.spec}, engine was built for {self.spec}")
         self.player = player
         self.opponent = 1 if player == 2 else 2
         self.max_depth = depth
         self.c_param = c_param
         self.nodes_evaluated = 0
-        
-    def get_best_move(self, game):
-        """العثور على أفضل حركة"""
-        self.nodes_evaluated = 0
+        self.completed_depth = 0
+        # الإحصاءات: العدادات داخل البحث دائماً، و SearchStats تبنى بعد كل حركة إذا كانت stats مفعلة
+        self.collect_stats = stats
+        self.last_stats = None
+        self.eval_calls = 0
+        self.depth_nodes = []
+        self.best_score = None
+        self._deadline = None
+        self._next_check = 0
+        self.check_interval = TIME_CHECK_INTERVAL
+        self._stop = None  # علامة (.value) توقف البحث عند ضبطها (عمليات Lazy SMP المساعدة و ponder)
+        # جداول قيم النوافذ والخطوط الكاملة بالترميز الثلاثي
+        self.patterns = pattern_tables(self.spec)
+        # جدول التبديل (0 أو None لتعطيله)
+        self.tt_size_mb = tt_size_mb
+        self.tt = TranspositionTable(tt_size_mb) if tt_size_mb else None
+        # الموقع وانعكاسه يشتركان في مدخل واحد، لأن التقييم متناظر عندما يكون للوحة عمود مركزي
+        self.symmetric = self.spec.cols % 2 == 1
+        # seed ثابت يجعل الاختيار بين الحركات المتعادلة (والبحث المتوازي) قابلاً للتكرار
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # ترتيب الحركات: حركتا killer لكل عمق من الجذر، وجدول تاريخ لكل لاعب وخانة
+        self.killers = [[None, None] for _ in range(self.spec.size + 1)]
+        self.history = [[0] * (self.spec.cols * self.spec.h1) for _ in range(2)]
+        # الأعمدة من المركز للأطراف عند تساوي الأولوية
+        self.column_order = sorted(range(self.spec.cols), key=lambda c: abs(c - self.spec.center))
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        # استعلامات ونجاحات جداول العمليات العاملة (البحث المتوازي في الجذر)
+        self.worker_tt_probes = 0
+        self.worker_tt_hits = 0
+        # تقييم كل أبناء عقدة بعمق 1 في نداء NumPy واحد
+        self.batch_leaves = batch_leaves
+        self.batch_evaluator = BatchEvaluator(self.spec) if batch_leaves else None
+        # عدد العمليات (1 = بحث متسلسل):
+        # "root" توزع حركات الجذر، و"lazy_smp" تبحث نفس الموقع بعمليات مساعدة وجدول مشترك
+        self.workers = workers
+        self.parallel = parallel
+        self.helper_nodes = 0
+        self._parallel_search = None
+        # يستدعى بعد كل عمق مكتمل: (العمق، أفضل الحركات، أفضل قيمة) - anytime.AsyncSearch
+        self.on_iteration = None
+        # نتائج التفكير أثناء دور الخصم (ponder.Ponderer):
+        # مفتاح _tt_keys -> (الحركات المتعادلة، العمق المكتمل)
+        self.ponder_results = {}
+    
+    def __getstate__(self):
+        # جدول التبديل والعمليات العاملة لا تنقل بين العمليات
+        state = self.__dict__.copy()
+        state['tt'] = None
+        state['_parallel_search'] = None
+        state['_stop'] = None
+        state['on_iteration'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.tt_size_mb:
+            self.tt = TranspositionTable(self.tt_size_mb)
+    
+    def close(self):
+        """إيقاف العمليات العاملة للبحث المتوازي إن وجدت"""
+        if self._parallel_search is not None:
+            search, self._parallel_search = self._parallel_search, None
+            search.close()
+    
+    def get_best_move(self, game, time_limit_ms=None, max_depth=None):
+        """العثور على أفضل حركة بالتعميق التكراري
+
+        يبحث بالعمق 1 ثم 2 ... حتى max_depth (افتراضياً عمق المستوى).
+        مع time_limit_ms تعاد أفضل حركة من آخر تكرار اكتمل قبل انتهاء الوقت.
+        """
+        self._reset_search()
+        self.last_stats = None
         
         if game.turn != self.player:
             return None
+        if game.spec != self.spec:
+            raise ValueError(f"game uses {game.spec}, engine was built for {self.spec}")
+        if max_depth is None:
+            max_depth = self.max_depth
+        if self.book is not None:
+            move = self.book.best_move(game)
+            if move is not None:
+                return self._unsearched_move(move, "book")
+        if self.ponder_results:
+            # نتيجة الرد الذي لعبه الخصم فعلاً، ونتائج الردود الأخرى تحذف
+            _, key, mirrored = self._tt_keys(game)
+            result = self.ponder_results.get(key)
+            self.ponder_results = {}
+            if result is not None and result[1] >= max_depth:
+                # الاختيار بين الحركات المتعادلة هنا كما بعد البحث العادي
+                move = self.rng.choice(result[0])
+                if mirrored:
+                    move = self.spec.mirror_move(move)
+                self.completed_depth = result[1]
+                if self.collect_stats:
+                    self.last_stats = SearchStats(move=move, depth=result[1],
+                                                  pv=[move], source="ponder")
+                return move
+        
+        # نسخة واحدة قابلة للتعديل لكامل البحث (play/undo بدون نسخ)
+        # مع مقيم تدريجي يجعل تقييم الأوراق بدون مرور على اللوحة
+        position = game.copy()
+        position.attach_evaluator(IncrementalEvaluator(self.spec))
+        moves = self._order_moves(position, 0)
+        if not moves:
+            return None
+        self._age_history()
+        
+        start = time.monotonic()
+        tt_probes, tt_hits = (self.tt.probes, self.tt.hits) if self.tt is not None else (0, 0)
+        soft_limit, hard_limit = self._allocate_time(position, time_limit_ms)
+        deadline = None if hard_limit is None else start + hard_limit
+        if deadline is None and self._stop is not None:
+            # بدون حد للوقت يبقى فحص علامة الإيقاف
+            deadline = float('inf')
+        
+        if self.workers > 1 and self.parallel == "lazy_smp":
+            helpers = self._parallel()
+            helpers.start(position, max_depth, deadline)
+            try:
+                best_moves = self._iterative_deepening(position, moves, max_depth, start,
+                                                       soft_limit, deadline)
+            finally:
+                self.helper_nodes = helpers.stop()
+        else:
+            best_moves = self._iterative_deepening(position, moves, max_depth, start,
+                                                   soft_limit, deadline)
+        
+        move = self.rng.choice(best_moves) if best_moves else None
+        if self.collect_stats:
+            self.last_stats = self._search_stats(game, move, time.monotonic() - start,
+                                                 tt_probes, tt_hits)
+        return move
+    
+    def _reset_search(self):
+        """تصفير عدادات البحث ونتائجه (SEARCH_STATE) قبل بحث جديد"""
+        self.nodes_evaluated = 0
+        self.completed_depth = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.helper_nodes = 0
+        self.eval_calls = 0
+        self.worker_tt_probes = 0
+        self.worker_tt_hits = 0
+        self.depth_nodes = []
+        self.best_score = None
+    
+    def _ponder_search(self, game, max_depth=None):
+        """بحث التفكير أثناء دور الخصم: (أفضل الحركات المتعادلة، العمق المكتمل)
+
+        نفس التعميق التكراري وجدول التبديل، لكن بدون تقادم جدول التاريخ وبدون
+        self.rng، وعدادات الحركة الأخيرة وإحصاءاتها (SEARCH_STATE) تبقى كما كانت.
+        البحث يتوقف بعلامة self._stop.
+        """
+        saved = {name: getattr(self, name) for name in self.SEARCH_STATE}
+        on_iteration, self.on_iteration = self.on_iteration, None
+        self._reset_search()
+        try:
+            position = game.copy()
+            position.attach_evaluator(IncrementalEvaluator(self.spec))
+            moves = self._order_moves(position, 0)
+            if not moves:
+                return [], 0
+            deadline = None if self._stop is None else float('inf')
+            best_moves = self._iterative_deepening(position, moves, max_depth or self.max_depth,
+                                                   time.monotonic(), None, deadline)
+            return best_moves, self.completed_depth
+        finally:
+            self.on_iteration = on_iteration
+            for name, value in saved.items():
+                setattr(self, name, value)
+    
+    def analyze(self, game, k=None, max_depth=None, time_limit_ms=None):
+        """تحليل متعدد الخطوط (multi-PV): [(العمود، القيمة، الخط الرئيسي)] لأفضل k حركة
+
+        القيم من منظور صاحب الدور في game، مرتبة تنازلياً (والتعادل بالقرب من
+        المركز). حلقة تعميق تكراري واحدة وجدول تبديل واحد لكل الحركات: كل حركة
+        تبحث بنافذة تبدأ تحت قيمة الحركة رقم k بنقطة، فتكون قيم أفضل k دقيقة
+        والباقي يقطع مبكراً. k=None تعطي كل الحركات الممكنة.
+        """
+        self.nodes_evaluated = 0
+        self.completed_depth = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.eval_calls = 0
+        if game.spec != self.spec:
+            raise ValueError(f"game uses {game.spec}, engine was built for {self.spec}")
+        if max_depth is None:
+            max_depth = self.max_depth
+        
+        player = self.player
+        self._set_perspective(game.turn)
+        try:
+            ranked = self._analyze(game, k, max_depth, time_limit_ms)
+        finally:
+            self._set_perspective(player)
+        return ranked
+    
+    def _analyze(self, game, k, max_depth, time_limit_ms):
+        position = game.copy()
+        position.attach_evaluator(IncrementalEvaluator(self.spec))
+        moves = self._order_moves(position, 0)
+        if not moves:
+            return []
+        if k is None or k > len(moves):
+            k = len(moves)
+        self._age_history()
+        
+        start = time.monotonic()
+        soft_limit, hard_limit = self._allocate_time(position, time_limit_ms)
+        deadline = None if hard_limit is None else start + hard_limit
+        if deadline is None and self._stop is not None:
+            deadline = float('inf')
+        
+        center_rank = {col: i for i, col in enumerate(self.column_order)}
+        ranked = []
+        for depth in range(1, max_depth + 1):
+            # ترتيب التكرار السابق أولاً
+            previous = [col for col, _ in ranked]
+            ordered = previous + [col for col in moves if col not in previous]
+            self._deadline = None if depth == 1 else deadline
+            self._next_check = self.nodes_evaluated + self.check_interval
+            exact = []
+            try:
+                for col in ordered:
+                    # قيمة الحركة رقم k حتى الآن: ما دونها لا يدخل القائمة
+                    bound = -float('inf')
+                    if len(exact) >= k:
+                        bound = sorted((score for _, score in exact), reverse=True)[k - 1]
+                    position.play(col)
+                    score = self._search_child(position, depth, bound - 1)
+                    position.undo()
+                    if score >= bound:
+                        exact.append((col, score))
+            except SearchTimeout:
+                break
+            finally:
+                self._deadline = None
+            exact.sort(key=lambda item: (-item[1], center_rank[item[0]]))
+            ranked = exact[:k]
+            self.completed_depth = depth
+            self.best_score = ranked[0][1]
+            
+            if all(abs(score) >= WIN_SCORE for _, score in ranked):
+                break
+            if soft_limit is not None and time.monotonic() - start >= soft_limit:
+                break
         
-        moves = self._order_moves(game)
+        return [(col, score, self.principal_variation(game, col, max(self.completed_depth, 1)))
+                for col, score in ranked]
+    
+    def _set_perspective(self, player):
+        """تغيير اللاعب الذي تحسب القيم من منظوره
+
+        قيم جدول التبديل مرتبطة بهذا المنظور، فيفرغ الجدول عند تغييره.
+        """
+        if player == self.player:
+            return
+        self.player = player
+        self.opponent = 1 if player == 2 else 2
+        if self.tt is not None:
+            self.tt.clear()
+    
+    def search(self, game, deadline=None, max_depth=None, executor=None):
+        """بحث غير متزامن: await engine.search(game, deadline=loop.time() + 2)
+
+        يعيد anytime.AsyncSearch، ويمكن تكراره (async for) لتحديث بعد كل عمق.
+        """
+        from anytime import AsyncSearch
+        return AsyncSearch(self, game, deadline, max_depth, executor)
+    
+    def _search_stats(self, game, move, elapsed, tt_probes, tt_hits):
+        """SearchStats من عدادات البحث الأخير (عدادات الجدول كفرق عن بدايته)"""
+        nodes = self.nodes_evaluated
+        per_depth = self.depth_nodes
+        if len(per_depth) >= 2 and per_depth[-2]:
+            branching = per_depth[-1] / per_depth[-2]
+        elif self.completed_depth:
+            branching = nodes ** (1 / self.completed_depth)
+        else:
+            branching = 0.0
+        interior = nodes - self.eval_calls
+        stats = SearchStats(
+            move=move, score=self.best_score, depth=self.completed_depth, nodes=nodes,
+            nodes_per_depth=per_depth[:], helper_nodes=self.helper_nodes, time=elapsed,
+            nps=(nodes + self.helper_nodes) / elapsed if elapsed else 0.0,
+            branching_factor=branching, cutoffs=self.cutoffs,
+            cutoff_rate=self.cutoffs / interior if interior > 0 else 0.0,
+            first_move_cutoff_rate=self.first_move_cutoff_rate(), eval_calls=self.eval_calls)
+        stats.tt_probes, stats.tt_hits = self.worker_tt_probes, self.worker_tt_hits
+        if self.tt is not None:
+            stats.tt_probes += self.tt.probes - tt_probes
+            stats.tt_hits += self.tt.hits - tt_hits
+        if move is not None:
+            stats.pv = self.principal_variation(game, move, max(self.completed_depth, 1))
+        return stats
+    
+    def _unsearched_move(self, move, source):
+        """حركة اختيرت بدون بحث: إحصاءاتها بصفر عقد، ثم تعاد كما هي"""
+        if self.collect_stats:
+            self.last_stats = SearchStats(move=move, pv=[move], source=source)
+        return move
+    
+    def principal_variation(self, game, move, length):
+        """الخط الرئيسي: move ثم حركات جدول التبديل حتى length حركة"""
+        position = game.copy()
+        pv = [move]
+        position.play(move)
+        tt = self.tt
+        while tt is not None and len(pv) < length and not position.game_over:
+            hash_key, key, mirrored = self._tt_keys(position)
+            entry = tt.probe(hash_key, key)
+            if entry is None or entry[3] is None:
+                break
+            col = self.spec.cols - 1 - entry[3] if mirrored else entry[3]
+            if not position.is_valid_location(col):
+                break
+            pv.append(col)
+            position.play(col)
+        return pv
+    
+    def _tt_keys(self, game):
+        """(مفتاح Zobrist، المفتاح الفريد، هل انعكس) لمدخل الموقع في جدول التبديل"""
+        if self.symmetric:
+            return game.canonical()
+        return game.hash, game.key(), False
+    
+    def _iterative_deepening(self, position, moves, max_depth, start, soft_limit, deadline):
+        """حلقة التعميق التكراري: أفضل الحركات المتعادلة من آخر تكرار اكتمل"""
+        best_moves = []
+        searched = self.nodes_evaluated
+        
+        for depth in range(1, max_depth + 1):
+            # أفضل حركات التكرار السابق أولاً
+            ordered = best_moves + [col for col in moves if col not in best_moves]
+            # العمق 1 يكتمل دائماً حتى يكون لدينا حركة
+            self._deadline = None if depth == 1 else deadline
+            self._next_check = self.nodes_evaluated + self.check_interval
+            try:
+                if self.workers > 1 and self.parallel == "root":
+                    best_moves, best_score = self._parallel().search(
+                        position, depth, ordered, self._deadline)
+                else:
+                    best_moves, best_score = self._search_root(position, depth, ordered)
+            except SearchTimeout:
+                break
+            finally:
+                self._deadline = None
+            self.completed_depth = depth
+            self.best_score = best_score
+            self.depth_nodes.append(self.nodes_evaluated - searched)
+            searched = self.nodes_evaluated
+            if self.on_iteration is not None:
+                self.on_iteration(depth, best_moves, best_score)
+            
+            # فوز أو خسارة مؤكدة: التعمق لن يغير النتيجة
+            if abs(best_score) >= WIN_SCORE:
+                break
+            if soft_limit is not None and time.monotonic() - start >= soft_limit:
+                break
         
+        return best_moves
+    
+    def _allocate_time(self, game, time_limit_ms):
+        """تقسيم الوقت حسب مرحلة اللعبة: (حد بدء تكرار جديد، الحد الأقصى) بالثواني
+
+        الافتتاح لا يستفيد كثيراً من العمق، والنهاية تفرعها أقل فتكرار إضافي أرخص.
+        """
+        if time_limit_ms is None:
+            return None, None
+        hard = time_limit_ms / 1000.0
+        filled = game.bitboard.moves / self.spec.size
+        if filled < 0.2:
+            fraction = 0.25  # افتتاح
+        elif filled < 0.6:
+            fraction = 0.5   # وسط اللعبة
+        else:
+            fraction = 0.6   # نهاية اللعبة
+        return hard * fraction, hard
+    
+    def _parallel(self):
+        """العمليات العاملة تنشأ عند أول بحث متوازٍ وتبقى للحركات التالية"""
+        if self._parallel_search is None:
+            from parallel import RootParallelSearch, LazySMPSearch
+            if self.parallel == "lazy_smp":
+                self._parallel_search = LazySMPSearch(self, self.workers)
+            else:
+                self._parallel_search = RootParallelSearch(self, self.workers)
+        return self._parallel_search
+    
+    def _search_child(self, position, depth, alpha):
+        """قيمة حركة جذر لعبت على position بنافذة (alpha, +inf)، من منظور self.player"""
+        return self._minimax_ab(position, depth - 1, alpha, float('inf'), False, 1)
+    
+    def _search_root(self, position, depth, moves):
+        """تكرار واحد بعمق ثابت: يعيد (أفضل الحركات المتعادلة، أفضل قيمة)"""
         best_score = -float('inf')
         best_moves = []
         
@@ -30,11 +495,11 @@ class MinimaxAlphaBeta:
         beta = float('inf')
         
         for col in moves:
-            if game.is_valid_location(col):
-                new_game = self._simulate_move(game, col)
-                
-                score = self._minimax_ab(new_game, self.max_depth - 1, 
-                                        alpha, beta, False)
+            if position.play(col):
+                # النافذة تحت أفضل قيمة بنقطة: ما يساويها قيمة دقيقة وليس حداً أعلى
+                score = self._minimax_ab(position, depth - 1, 
+                                        alpha - 1, beta, False, 1)
+                position.undo()
                 
                 if score > best_score:
                     best_score = score
@@ -44,237 +509,236 @@ class MinimaxAlphaBeta:
                 
                 alpha = max(alpha, score)
         
-        return random.choice(best_moves) if best_moves else None
+        return best_moves, best_score
     
-    def _minimax_ab(self, game, depth, alpha, beta, maximizing_player):
-        """Minimax مع Alpha-Beta"""
+    def _check_time(self):
+        """رفع SearchTimeout إذا انتهى الوقت أو طلب الإيقاف، وتحديد موعد الفحص التالي"""
+        self._next_check = self.nodes_evaluated + self.check_interval
+        if time.monotonic() >= self._deadline or (self._stop is not None and self._stop.value):
+            raise SearchTimeout()
+    
+    def _minimax_ab(self, game, depth, alpha, beta, maximizing_player, ply=1):
+        """Minimax مع Alpha-Beta وجدول التبديل"""
         self.nodes_evaluated += 1
+        if self._deadline is not None and self.nodes_evaluated >= self._next_check:
+            self._check_time()
         
         if depth == 0 or game.game_over:
+            self.eval_calls += 1
             return self._evaluate_board(game)
         
+        tt = self.tt
+        tt_move = None
+        if tt is not None:
+            hash_key, key, mirrored = self._tt_keys(game)
+            entry = tt.probe(hash_key, key)
+            if entry is not None:
+                entry_depth, value, flag, tt_move = entry
+                if mirrored and tt_move is not None:
+                    tt_move = self.spec.cols - 1 - tt_move
+                if entry_depth >= depth:
+                    if flag == EXACT:
+                        return value
+                    if flag == LOWER:
+                        alpha = max(alpha, value)
+                    else:
+                        beta = min(beta, value)
+                    if alpha >= beta:
+                        return value
+        alpha_orig, beta_orig = alpha, beta
+        
+        moves = self._order_moves(game, ply, tt_move)
+        best_move = None
+        
+        # الأبناء أوراق: تقييمهم دفعة واحدة ثم نفس منطق القطع بالترتيب
+        leaf_scores = None
+        if depth == 1 and self.batch_leaves:
+            leaf_scores = self._evaluate_children(game, moves)
+            self.nodes_evaluated += len(moves)
+            self.eval_calls += len(moves)
+        
         if maximizing_player:
             max_eval = -float('inf')
-            moves = self._order_moves(game)
             
-            for col in moves:
-                if game.is_valid_location(col):
-                    new_game = self._simulate_move(game, col)
-                    
-                    eval_score = self._minimax_ab(new_game, depth - 1, 
-                                                 alpha, beta, False)
-                    
-                    max_eval = max(max_eval, eval_score)
-                    alpha = max(alpha, eval_score)
-                    
-                    if alpha >= beta:
-                        break
+            for i, col in enumerate(moves):
+                if leaf_scores is not None:
+                    eval_score = leaf_scores[i]
+                elif game.play(col):
+                    eval_score = self._minimax_ab(game, depth - 1, 
+                                                 alpha, beta, False, ply + 1)
+                    game.undo()
+                else:
+                    continue
+                
+                if eval_score > max_eval:
+                    max_eval = eval_score
+                    best_move = col
+                alpha = max(alpha, eval_score)
+                
+                if alpha >= beta:
+                    self._record_cutoff(game, col, depth, ply, i == 0)
+                    break
             
-            return max_eval
+            value = max_eval
             
         else:
             min_eval = float('inf')
-            moves = self._order_moves(game)
             
-            for col in moves:
-                if game.is_valid_location(col):
-                    new_game = self._simulate_move(game, col)
-                    
-                    eval_score = self._minimax_ab(new_game, depth - 1, 
-                                                 alpha, beta, True)
-                    
-                    min_eval = min(min_eval, eval_score)
-                    beta = min(beta, eval_score)
-                    
-                    if beta <= alpha:
-                        break
+            for i, col in enumerate(moves):
+                if leaf_scores is not None:
+                    eval_score = leaf_scores[i]
+                elif game.play(col):
+                    eval_score = self._minimax_ab(game, depth - 1, 
+                                                 alpha, beta, True, ply + 1)
+                    game.undo()
+                else:
+                    continue
+                
+                if eval_score < min_eval:
+                    min_eval = eval_score
+                    best_move = col
+                beta = min(beta, eval_score)
+                
+                if beta <= alpha:
+                    self._record_cutoff(game, col, depth, ply, i == 0)
+                    break
             
-            return min_eval
-    
-    def _simulate_move(self, game, col):
-        """محاكاة حركة"""
-        new_game = Connect4Game()
-        new_game.board = game.board.copy()
-        new_game.turn = game.turn
+            value = min_eval
         
-        if new_game.drop_piece(col):
-            new_game.switch_turn()
+        if tt is not None:
+            if value <= alpha_orig:
+                flag = UPPER
+            elif value >= beta_orig:
+                flag = LOWER
+            else:
+                flag = EXACT
+            if mirrored and best_move is not None:
+                best_move = self.spec.cols - 1 - best_move
+            tt.store(hash_key, key, depth, value, flag, best_move)
         
-        return new_game
+        return value
     
-    def _order_moves(self, game):
-        """ترتيب الحركات - متوازن وغير مركز على المركز"""
-        valid_moves = [c for c in range(COLS) if game.is_valid_location(c)]
-        
-        if not valid_moves:
+    def _order_moves(self, game, ply=0, tt_move=None):
+        """ترتيب الحركات لزيادة القطع
+
+        حركة جدول التبديل، ثم الفوز الفوري، ثم صد فوز الخصم، ثم حركتا killer
+        لهذا العمق، ثم جدول التاريخ. التعادل يحسم بالقرب من المركز.
+        """
+        if game.game_over:
             return []
         
-        center = COLS // 2
-        
-        # تصنيف الحركات
-        center_moves = []
-        strategic_moves = []
-        other_moves = []
-        
-        for col in valid_moves:
-            # تحقق أولاً من الحركات الاستراتيجية
-            if self._is_strategic_move(game, col):
-                strategic_moves.append(col)
-            elif col == center:
-                center_moves.append(col)
+        board = game.bitboard
+        legal = board.legal_moves_mask()
+        wins = board.winning_positions(board.current) & legal
+        blocks = board.winning_positions(board.current ^ board.mask) & legal
+        killers = self.killers[ply]
+        history = self.history[game.turn - 1]
+        
+        scored = []
+        for col in self.column_order:
+            if not board.can_play(col):
+                continue
+            bit = board.heights[col]
+            move = 1 << bit
+            if col == tt_move:
+                score = TT_MOVE_PRIORITY
+            elif wins & move:
+                score = WIN_PRIORITY
+            elif blocks & move:
+                score = BLOCK_PRIORITY
+            elif col == killers[0]:
+                score = KILLER_PRIORITY + 1
+            elif col == killers[1]:
+                score = KILLER_PRIORITY
             else:
-                other_moves.append(col)
-        
-        # **التعديل: لا نضع المركز أولاً دائماً**
-        ordered = []
-        
-        # 1. الحركات الاستراتيجية أولاً
-        ordered.extend(strategic_moves)
-        
-        # 2. الحركات الأخرى (مرتبة حسب المسافة من المركز)
-        # نخلطها لعدم التركيز على نمط واحد
-        random.shuffle(other_moves)
-        ordered.extend(other_moves)
-        
-        # 3. المركز أخيراً (لتجنب التركيز عليه)
-        ordered.extend(center_moves)
-        
-        return ordered
-    
-    def _is_strategic_move(self, game, col):
-        """تحقق إذا كانت الحركة استراتيجية"""
-        if not game.is_valid_location(col):
-            return False
-        
-        # محاكاة سريعة
-        temp_game = self._simulate_move(game, col)
-        
-        # تحقق من التهديدات
-        if self._has_immediate_threat(temp_game):
-            return True
-        
-        # تحقق من منع تهديدات الخصم
-        opponent_temp = Connect4Game()
-        opponent_temp.board = game.board.copy()
-        opponent_temp.turn = self.opponent
-        
-        if opponent_temp.drop_piece(col):
-            if opponent_temp.game_over:
-                return True
-        
-        return False
-    
-    def _has_immediate_threat(self, game):
-        """تحقق من وجود تهديد فوري"""
-        # تحقق من جميع الاتجاهات للاعب الحالي
-        player = game.turn
-        board = game.board
-        
-        # أفقي
-        for r in range(ROWS):
-            for c in range(COLS - 3):
-                if (board[r][c] == player and board[r][c+1] == player and 
-                    board[r][c+2] == player and board[r][c+3] == 0):
-                    return True
-        
-        # رأسي
-        for c in range(COLS):
-            for r in range(ROWS - 3):
-                if (board[r][c] == player and board[r+1][c] == player and 
-                    board[r+2][c] == player and board[r+3][c] == 0):
-                    return True
-        
-        # قطري صاعد
-        for r in range(ROWS - 3):
-            for c in range(COLS - 3):
-                if (board[r][c] == player and board[r+1][c+1] == player and 
-                    board[r+2][c+2] == player and board[r+3][c+3] == 0):
-                    return True
-        
-        # قطري منحدر
-        for r in range(3, ROWS):
-            for c in range(COLS - 3):
-                if (board[r][c] == player and board[r-1][c+1] == player and 
-                    board[r-2][c+2] == player and board[r-3][c+3] == 0):
-                    return True
-        
-        return False
+                score = history[bit]
+            scored.append((score, col))
+        
+        # sorted مستقر: المتساوي يبقى بترتيب column_order
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [col for _, col in scored]
+    
+    def _record_cutoff(self, game, col, depth, ply, first):
+        """تحديث killers والتاريخ بعد قطع بحركة col (بعد undo)"""
+        self.cutoffs += 1
+        if first:
+            self.first_move_cutoffs += 1
+        
+        killers = self.killers[ply]
+        if killers[0] != col:
+            killers[1] = killers[0]
+            killers[0] = col
+        self.history[game.turn - 1][game.bitboard.heights[col]] += depth * depth
+    
+    def _age_history(self):
+        """تقليل جدول التاريخ بين الحركات حتى لا تسيطر المواقع القديمة"""
+        for table in self.history:
+            for i, value in enumerate(table):
+                table[i] = value >> 1
+        for killers in self.killers:
+            killers[0] = killers[1] = None
+    
+    def first_move_cutoff_rate(self):
+        """نسبة القطع التي حدثت عند أول حركة مرتبة (كلما اقتربت من 1 كان الترتيب أفضل)"""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
     
     def _evaluate_board(self, game):
         """تقييم متوازن للوحة"""
         if game.game_over:
             if game.winner == self.player:
-                return 1000000
+                return WIN_SCORE
             elif game.winner == self.opponent:
-                return -1000000
+                return -WIN_SCORE
             return 0
         
-        score = 0
+        if game.evaluator is not None:
+            return game.evaluator.score(self.player)
         
-        # تقييم جميع الاتجاهات الأفقية
-        for r in range(ROWS):
-            for c in range(COLS - 3):
-                window = game.board[r, c:c+4]
-                score += self._evaluate_window(window, self.player) * 12
-                score -= self._evaluate_window(window, self.opponent) * 12
-        
-        # تقييم الاتجاهات الرأسية
-        for c in range(COLS):
-            for r in range(ROWS - 3):
-                window = [game.board[r][c], game.board[r+1][c], 
-                         game.board[r+2][c], game.board[r+3][c]]
-                score += self._evaluate_window(window, self.player) * 8
-                score -= self._evaluate_window(window, self.opponent) * 8
-        
-        # تقييم القطر الصاعد
-        for r in range(ROWS - 3):
-            for c in range(COLS - 3):
-                window = [game.board[r][c], game.board[r+1][c+1],
-                         game.board[r+2][c+2], game.board[r+3][c+3]]
-                score += self._evaluate_window(window, self.player) * 15
-                score -= self._evaluate_window(window, self.opponent) * 15
-        
-        # تقييم القطر المنحدر
-        for r in range(3, ROWS):
-            for c in range(COLS - 3):
-                window = [game.board[r][c], game.board[r-1][c+1],
-                         game.board[r-2][c+2], game.board[r-3][c+3]]
-                score += self._evaluate_window(window, self.player) * 15
-                score -= self._evaluate_window(window, self.opponent) * 15
+        score = 0
+        spec = self.spec
+        rows, cols = spec.rows, spec.cols
+        cells = game.board.ravel().tolist()
+        
+        # كل صف وعمود وقطر كامل يقيم بقراءة واحدة من جدوله (كل نوافذه بوزن اتجاهها)
+        line_score = 0
+        for segment, table in zip(self.patterns.segments, self.patterns.segment_tables):
+            index = 0
+            for i in segment:
+                index = index * 3 + cells[i]
+            line_score += table[index]
+        score += line_score if self.player == 1 else -line_score
         
         # **تخفيض كبير لوزن المركز**
-        center = COLS // 2
+        center = spec.center
         center_weight = 1  # وزن خفيف جداً
         
-        for r in range(ROWS):
-            if game.board[r][center] == self.player:
-                score += (ROWS - r) * center_weight
+        for r in range(rows):
+            if cells[r * cols + center] == self.player:
+                score += (rows - r) * center_weight
         
         # **زيادة وزن الأعمدة المجاورة للمركز**
         for offset in [-1, 1, -2, 2]:
             col = center + offset
-            if 0 <= col < COLS:
-                for r in range(ROWS):
-                    if game.board[r][col] == self.player:
-                        score += (ROWS - r) * 2  # وزن مضاعف
+            if 0 <= col < cols:
+                for r in range(rows):
+                    if cells[r * cols + col] == self.player:
+                        score += (rows - r) * 2  # وزن مضاعف
         
         # **مكافأة التنوع في الأعمدة**
         columns_used = set()
-        for r in range(ROWS):
-            for c in range(COLS):
-                if game.board[r][c] == self.player:
-                    columns_used.add(c)
+        for i, piece in enumerate(cells):
+            if piece == self.player:
+                columns_used.add(i % cols)
         
         diversity_bonus = len(columns_used) * 8
         score += diversity_bonus
         
         # **عقوبة التركيز في عمود واحد**
         if len(columns_used) > 0:
-            pieces_per_column = [0] * COLS
-            for r in range(ROWS):
-                for c in range(COLS):
-                    if game.board[r][c] == self.player:
-                        pieces_per_column[c] += 1
+            pieces_per_column = [0] * cols
+            for i, piece in enumerate(cells):
+                if piece == self.player:
+                    pieces_per_column[i % cols] += 1
             
             max_concentration = max(pieces_per_column)
             total_pieces = sum(pieces_per_column)
@@ -286,57 +750,196 @@ class MinimaxAlphaBeta:
         
         return score
     
+    def _evaluate_batch(self, boards):
+        """تقييم مصفوفة لوحات (N, rows, cols) دفعة واحدة، مطابق لـ _evaluate_board"""
+        if self.batch_evaluator is None:
+            self.batch_evaluator = BatchEvaluator(self.spec)
+        return self.batch_evaluator.evaluate(boards, self.player)
+    
+    def _evaluate_children(self, game, moves):
+        """قيم المواقع بعد كل حركة من moves (بدون لعبها على game)"""
+        boards = np.repeat(game.board[None], len(moves), axis=0)
+        for i, col in enumerate(moves):
+            boards[i, game.get_next_open_row(col), col] = game.turn
+        return self._evaluate_batch(boards).tolist()
+    
     def _evaluate_window(self, window, player):
-        """تقييم نافذة 4 خلايا"""
-        opponent = 1 if player == 2 else 2
-        
-        player_count = 0
-        opponent_count = 0
-        empty_count = 0
-        
-        for cell in window:
-            if cell == player:
-                player_count += 1
-            elif cell == opponent:
-                opponent_count += 1
-            else:
-                empty_count += 1
-        
-        if player_count == 4:
-            return 1000
-        elif player_count == 3 and empty_count == 1:
-            return 80
-        elif player_count == 2 and empty_count == 2:
-            return 15
-        elif opponent_count == 3 and empty_count == 1:
-            return -70
-        elif opponent_count == 2 and empty_count == 2:
-            return -10
-        else:
-            return 0
+        """تقييم نافذة بطول connect خلايا (4 في اللوحة القياسية) من جدول الأنماط"""
+        return self.patterns.window[player][pattern_index(window)]
     
     def _evaluate_threats(self, game, player):
         """تقييم التهديدات"""
         threat_score = 0
+        cells = game.board.ravel().tolist()
         
-        # أفقي
-        for r in range(ROWS):
-            for c in range(COLS - 3):
-                window = game.board[r, c:c+4]
+        # أفقي ورأسي وقطري (بدون القطر المعاكس)
+        for line, direction in zip(self.spec.win_lines, self.spec.line_directions):
+            if direction != ANTI_DIAGONAL:
+                window = [cells[i] for i in line]
                 threat_score += self._evaluate_window(window, player)
         
-        # رأسي
-        for c in range(COLS):
-            for r in range(ROWS - 3):
-                window = [game.board[r][c], game.board[r+1][c],
-                         game.board[r+2][c], game.board[r+3][c]]
-                threat_score += self._evaluate_window(window, player)
+        return threat_score
+
+
+class NegamaxPVS(MinimaxAlphaBeta):
+    """Negamax مع Principal Variation Search ونوافذ الطموح
+
+    نفس التقييم وترتيب الحركات وجدول التبديل، لكن بفرع واحد بدل max/min:
+    القيم دائماً من منظور اللاعب صاحب الدور. الحركة الأولى تبحث بنافذة كاملة
+    والباقي بنافذة صفرية، ويعاد البحث فقط إذا تجاوزت alpha.
+    """
+    
+    SEARCH_STATE = MinimaxAlphaBeta.SEARCH_STATE + ("root_scores", "research_count",
+                                                     "aspiration_fails")
+    
+    def __init__(self, player, depth, c_param=1.41, spec=None, tt_size_mb=16, seed=None,
+                 batch_leaves=False, workers=1, parallel="root", book=None, stats=True):
+        super().__init__(player, depth, c_param, spec, tt_size_mb, seed, batch_leaves,
+                         workers, parallel, book, stats)
+        # None = بدون نوافذ طموح (نافذة كاملة في كل تكرار)
+        self.aspiration_window = ASPIRATION_WINDOW
+        self.root_scores = {}
+        self.research_count = 0
+        self.aspiration_fails = 0
+    
+    def _reset_search(self):
+        super()._reset_search()
+        self.root_scores = {}
+        self.research_count = 0
+        self.aspiration_fails = 0
+    
+    def _search_root(self, position, depth, moves):
+        """نافذة حول قيمة التكرار بنفس الزوجية، تتسع تدريجياً من جهة الفشل"""
+        previous = self.root_scores.get(depth - 2)
+        if self.aspiration_window is None or previous is None or abs(previous) >= WIN_SCORE:
+            best_moves, score = self._pvs_root(position, depth, moves,
+                                               -float('inf'), float('inf'))
+        else:
+            below = above = self.aspiration_window
+            while True:
+                alpha = previous - below if below < WIN_SCORE else -float('inf')
+                beta = previous + above if above < WIN_SCORE else float('inf')
+                best_moves, score = self._pvs_root(position, depth, moves, alpha, beta)
+                if score <= alpha:
+                    below *= ASPIRATION_GROWTH
+                elif score >= beta:
+                    above *= ASPIRATION_GROWTH
+                else:
+                    break
+                self.aspiration_fails += 1
+                self.research_count += 1
+        
+        self.root_scores[depth] = score
+        return best_moves, score
+    
+    def _search_child(self, position, depth, alpha):
+        return -self._negamax(position, depth - 1, -float('inf'), -alpha, 1)
+    
+    def _pvs_root(self, position, depth, moves, alpha, beta):
+        """الجذر مع الاحتفاظ بكل الحركات المتعادلة في أفضل قيمة"""
+        best_score = -float('inf')
+        best_moves = []
         
-        # قطري
-        for r in range(ROWS - 3):
-            for c in range(COLS - 3):
-                window = [game.board[r][c], game.board[r+1][c+1],
-                         game.board[r+2][c+2], game.board[r+3][c+3]]
-                threat_score += self._evaluate_window(window, player)
+        for col in moves:
+            if not position.play(col):
+                continue
+            if not best_moves:
+                score = -self._negamax(position, depth - 1, -beta, -alpha, 1)
+            else:
+                # نافذة صفرية تحت أفضل قيمة: التعادل أو الأفضل يفشل للأعلى
+                bound = max(alpha, best_score)
+                score = -self._negamax(position, depth - 1, -bound, -bound + 1, 1)
+                if score >= bound and score < beta:
+                    self.research_count += 1
+                    score = -self._negamax(position, depth - 1, -beta, -bound + 1, 1)
+            position.undo()
+            
+            if score > best_score:
+                best_score = score
+                best_moves = [col]
+            elif score == best_score:
+                best_moves.append(col)
+            
+            if best_score >= beta:
+                break
+        
+        return best_moves, best_score
+    
+    def _negamax(self, game, depth, alpha, beta, ply):
+        """Negamax بنافذة (alpha, beta) والقيمة من منظور صاحب الدور"""
+        self.nodes_evaluated += 1
+        if self._deadline is not None and self.nodes_evaluated >= self._next_check:
+            self._check_time()
+        
+        if depth == 0 or game.game_over:
+            self.eval_calls += 1
+            score = self._evaluate_board(game)
+            return score if game.turn == self.player else -score
+        
+        tt = self.tt
+        tt_move = None
+        if tt is not None:
+            hash_key, key, mirrored = self._tt_keys(game)
+            entry = tt.probe(hash_key, key)
+            if entry is not None:
+                entry_depth, value, flag, tt_move = entry
+                if mirrored and tt_move is not None:
+                    tt_move = self.spec.cols - 1 - tt_move
+                if entry_depth >= depth:
+                    if flag == EXACT:
+                        return value
+                    if flag == LOWER:
+                        alpha = max(alpha, value)
+                    else:
+                        beta = min(beta, value)
+                    if alpha >= beta:
+                        return value
+        alpha_orig, beta_orig = alpha, beta
+        
+        moves = self._order_moves(game, ply, tt_move)
+        best_score = -float('inf')
+        best_move = None
+        
+        # الأبناء أوراق: قيم دقيقة دفعة واحدة فلا حاجة للنافذة الصفرية
+        leaf_scores = None
+        if depth == 1 and self.batch_leaves:
+            sign = 1 if game.turn == self.player else -1
+            leaf_scores = [sign * score for score in self._evaluate_children(game, moves)]
+            self.nodes_evaluated += len(moves)
+            self.eval_calls += len(moves)
+        
+        for i, col in enumerate(moves):
+            if leaf_scores is not None:
+                score = leaf_scores[i]
+            elif not game.play(col):
+                continue
+            else:
+                if best_move is None:
+                    score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1)
+                else:
+                    score = -self._negamax(game, depth - 1, -alpha - 1, -alpha, ply + 1)
+                    if alpha < score < beta:
+                        self.research_count += 1
+                        score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1)
+                game.undo()
+            
+            if score > best_score:
+                best_score = score
+                best_move = col
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self._record_cutoff(game, col, depth, ply, i == 0)
+                break
+        
+        if tt is not None:
+            if best_score <= alpha_orig:
+                flag = UPPER
+            elif best_score >= beta_orig:
+                flag = LOWER
+            else:
+                flag = EXACT
+            if mirrored and best_move is not None:
+                best_move = self.spec.cols - 1 - best_move
+            tt.store(hash_key, key, depth, best_score, flag, best_move)
         
-        return threat_score
\ No newline at end of file
+        return best_score
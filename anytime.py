@@ -0,0 +1,91 @@
+# anytime.py
+import asyncio
+import ctypes
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class SearchUpdate:
+    """نتيجة تكرار مكتمل من التعميق التكراري"""
+    depth: int
+    move: int
+    score: float
+    nodes: int
+    time: float
+    moves: list = field(default_factory=list)  # كل الحركات المتعادلة في أفضل قيمة
+
+
+class AsyncSearch:
+    """بحث get_best_move في executor دون إيقاف حلقة asyncio
+
+    - await search: الحركة النهائية
+    - async for update in search: SearchUpdate بعد كل عمق مكتمل
+    - cancel(): إيقاف البحث، وawait يعيد أفضل حركة من آخر عمق اكتمل
+
+    إلغاء المهمة التي تنتظر البحث يوقفه أيضاً. المحرك يبحث موقعاً واحداً
+    في كل مرة (لا يستخدم مع ponder.Ponderer على نفس المحرك).
+    """
+
+    def __init__(self, engine, game, deadline=None, max_depth=None, executor=None):
+        self.engine = engine
+        self.loop = asyncio.get_running_loop()
+        self.last_update = None
+        self._updates = asyncio.Queue()
+        self._stop = ctypes.c_bool(False)
+        self._start = time.monotonic()
+        # deadline بتوقيت الحلقة (loop.time())
+        time_limit_ms = None
+        if deadline is not None:
+            time_limit_ms = max(0.0, (deadline - self.loop.time()) * 1000)
+        self._future = self.loop.run_in_executor(executor, self._run, game.copy(),
+                                                 time_limit_ms, max_depth)
+        self._future.add_done_callback(lambda _: self._updates.put_nowait(None))
+
+    def _run(self, game, time_limit_ms, max_depth):
+        engine = self.engine
+        engine._stop = self._stop
+        engine.on_iteration = self._iteration
+        try:
+            return engine.get_best_move(game, time_limit_ms, max_depth)
+        finally:
+            engine._stop = None
+            engine.on_iteration = None
+
+    def _iteration(self, depth, best_moves, best_score):
+        # من خيط البحث: التحديث يسلم لحلقة asyncio
+        update = SearchUpdate(depth, best_moves[0], best_score, self.engine.nodes_evaluated,
+                              time.monotonic() - self._start, list(best_moves))
+        self.loop.call_soon_threadsafe(self._publish, update)
+
+    def _publish(self, update):
+        self.last_update = update
+        self._updates.put_nowait(update)
+
+    def cancel(self):
+        """إيقاف البحث بعد أقرب فحص للوقت (النتيجة تبقى متاحة بـ await)"""
+        self._stop.value = True
+
+    def done(self):
+        return self._future.done()
+
+    async def result(self):
+        try:
+            return await asyncio.shield(self._future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def __await__(self):
+        return self.result().__await__()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        update = await self._updates.get()
+        if update is None:
+            # نهاية البحث تبقى في الطابور لأي تكرار لاحق
+            self._updates.put_nowait(None)
+            raise StopAsyncIteration
+        return update
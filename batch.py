@@ -0,0 +1,197 @@
+# batch.py
+import numpy as np
+from game import DEFAULT_SPEC
+
+# الاتجاهات الأربعة لفحص الفوز: أفقي، رأسي، قطري، قطري معاكس
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+
+
+class BatchConnect4:
+    """محاكاة N لعبة في نفس الوقت بعمليات NumPy بدون حلقة لكل لعبة"""
+
+    def __init__(self, n, spec=None):
+        self.spec = DEFAULT_SPEC if spec is None else spec
+        self.n = n
+        self.boards = np.zeros((n, self.spec.rows, self.spec.cols), dtype=np.int8)
+        self.heights = np.zeros((n, self.spec.cols), dtype=np.int8)  # عدد الأحجار في كل عمود
+        self.turn = np.ones(n, dtype=np.int8)
+        self.winner = np.full(n, -1, dtype=np.int8)  # -1 جارية، 0 تعادل، 1/2 الفائز
+        self.moves = np.zeros(n, dtype=np.int16)
+        self._index = np.arange(n)
+
+    @classmethod
+    def from_bitboard(cls, current, mask, player, n, spec=None):
+        """n نسخ من موقع بت بورد: current أحجار player (صاحب الدور) و mask كل الأحجار"""
+        batch = cls(n, spec)
+        spec = batch.spec
+        board = np.zeros(spec.size, dtype=np.int8)
+        opponent = 3 - player
+        for cell, bit in enumerate(spec.cell_bits):
+            if mask & bit:
+                board[cell] = player if current & bit else opponent
+        board = board.reshape(spec.rows, spec.cols)
+        batch.boards[:] = board
+        batch.heights[:] = (board != 0).sum(axis=0)
+        batch.turn[:] = player
+        batch.moves[:] = bin(mask).count('1')
+        return batch
+
+    @classmethod
+    def from_game(cls, game, n):
+        """n نسخ من الموقع الحالي في game"""
+        bb = game.bitboard
+        batch = cls.from_bitboard(bb.current, bb.mask, game.turn, n, game.spec)
+        if game.game_over:
+            batch.winner[:] = game.winner
+        return batch
+
+    @property
+    def game_over(self):
+        return self.winner >= 0
+
+    def legal_moves(self):
+        """مصفوفة (N, cols) منطقية بالأعمدة المتاحة لكل لعبة جارية"""
+        return (self.heights < self.spec.rows) & (self.winner < 0)[:, None]
+
+    def random_moves(self, rng=None):
+        """اختيار عمود عشوائي متاح لكل لعبة (الألعاب المنتهية تعيد 0)"""
+        rng = np.random.default_rng() if rng is None else rng
+        scores = rng.random((self.n, self.spec.cols))
+        scores[~self.legal_moves()] = -1.0
+        return scores.argmax(axis=1)
+
+    def drop(self, cols):
+        """إسقاط حجر في العمود المحدد لكل لعبة ثم تمرير الدور
+
+        الحركات غير الصالحة (عمود خارج اللوحة أو ممتلئ، أو لعبة منتهية) تتجاهل.
+        تعيد مصفوفة منطقية بالحركات التي نفذت.
+        """
+        rows = self.spec.rows
+        cols = np.asarray(cols)
+        idx = self._index
+        inside = (cols >= 0) & (cols < self.spec.cols)
+        ok = inside & (self.winner < 0) & (self.heights[idx, np.where(inside, cols, 0)] < rows)
+        i = idx[ok]
+        c = cols[ok]
+        player = self.turn[i]
+        r = rows - 1 - self.heights[i, c].astype(np.intp)
+        self.boards[i, r, c] = player
+        self.heights[i, c] += 1
+        self.moves[i] += 1
+
+        win = self._wins_at(i, r, c, player)
+        self.winner[i[win]] = player[win]
+        draw = ~win & (self.moves[i] == self.spec.size)
+        self.winner[i[draw]] = 0
+        self.turn[i] = 3 - player
+        return ok
+
+    def _wins_at(self, i, r, c, player):
+        """فحص الفوز عبر الخطوط المارة بآخر حجر فقط"""
+        rows, cols, n = self.spec.rows, self.spec.cols, self.spec.connect
+        win = np.zeros(len(i), dtype=bool)
+        for dr, dc in DIRECTIONS:
+            count = np.ones(len(i), dtype=np.int8)
+            for sign in (1, -1):
+                alive = np.ones(len(i), dtype=bool)
+                for k in range(1, n):
+                    rr = r + sign * dr * k
+                    cc = c + sign * dc * k
+                    inside = (rr >= 0) & (rr < rows) & (cc >= 0) & (cc < cols)
+                    cell = self.boards[i, np.clip(rr, 0, rows - 1), np.clip(cc, 0, cols - 1)]
+                    alive &= inside & (cell == player)
+                    count += alive
+            win |= count >= n
+        return win
+
+    def reset(self, which=None):
+        """إعادة تعيين الألعاب المنتهية (أو الألعاب المحددة بقناع منطقي)"""
+        if which is None:
+            which = self.winner >= 0
+        self.boards[which] = 0
+        self.heights[which] = 0
+        self.turn[which] = 1
+        self.winner[which] = -1
+        self.moves[which] = 0
+        return which
+
+    def rollout(self, rng=None):
+        """حركات عشوائية قانونية حتى تنتهي كل الألعاب، ويعيد نسخة من winner"""
+        rng = np.random.default_rng() if rng is None else rng
+        while not self.game_over.all():
+            self.drop(self.random_moves(rng))
+        return self.winner.copy()
+
+
+
+def bitboard_rollouts(current, mask, moves, k, spec=None, rng=None):
+    """k لعبة عشوائية من موقع بت بورد، كلها معاً على مصفوفات uint64
+
+    كل حركة لكل الألعاب الجارية بضع عمليات NumPy: الأعمدة المتاحة من
+    القناع، عمود عشوائي منها، وفحص الفوز بالإزاحة. النتيجة لكل لعبة من
+    منظور صاحب الدور: 1 فوز، -1 خسارة، 0 تعادل.
+    اللوحات التي لا تتسع في 64 بت تلعب بـ BatchConnect4.
+    """
+    spec = DEFAULT_SPEC if spec is None else spec
+    rng = np.random.default_rng() if rng is None else rng
+    if spec.cols * spec.h1 > 64:
+        winner = BatchConnect4.from_bitboard(current, mask, 1, k, spec).rollout(rng)
+        return np.where(winner == 1, 1, np.where(winner == 2, -1, 0)).astype(np.int8)
+
+    h1 = spec.h1
+    bottom = np.uint64(spec.bottom_mask)
+    board_mask = np.uint64(spec.board_mask)
+    column_masks = np.array([((1 << spec.rows) - 1) << (c * h1) for c in range(spec.cols)],
+                            dtype=np.uint64)
+    shifts = [[np.uint64(i * d) for i in range(1, spec.connect)] for d in (1, h1, h1 - 1, h1 + 1)]
+
+    result = np.zeros(k, dtype=np.int8)
+    games = np.arange(k)
+    cur = np.full(k, current, dtype=np.uint64)
+    msk = np.full(k, mask, dtype=np.uint64)
+    sign = 1
+    for _ in range(moves, spec.size):
+        possible = (msk + bottom) & board_mask
+        legal = (possible[:, None] & column_masks) != 0
+        scores = rng.random(legal.shape)
+        scores[~legal] = -1.0
+        move = possible & column_masks[scores.argmax(axis=1)]
+        stones = cur | move
+        msk |= move
+
+        win = np.zeros(len(games), dtype=bool)
+        for direction in shifts:
+            m = stones
+            for shift in direction:
+                m = m & (stones >> shift)
+            win |= m != 0
+        result[games[win]] = sign
+
+        running = ~win
+        games = games[running]
+        if not len(games):
+            break
+        # الدور للخصم: أحجاره هي القناع بدون أحجار من لعب
+        cur = (stones ^ msk)[running]
+        msk = msk[running]
+        sign = -sign
+    return result
+
+
+def rollout_stats(game, k, rng=None):
+    """(فوز، تعادل، خسارة) لصاحب الدور في k لعبة عشوائية من موقع game"""
+    if game.game_over:
+        if game.winner == 0:
+            return 0, k, 0
+        return (k, 0, 0) if game.winner == game.turn else (0, 0, k)
+    bb = game.bitboard
+    result = bitboard_rollouts(bb.current, bb.mask, bb.moves, k, game.spec, rng)
+    wins = int((result == 1).sum())
+    draws = int((result == 0).sum())
+    return wins, draws, k - wins - draws
+
+
+def estimate_win_rate(game, k, rng=None):
+    """نسبة فوز صاحب الدور (التعادل نصف فوز) من k لعبة عشوائية"""
+    wins, draws, _ = rollout_stats(game, k, rng)
+    return (wins + 0.5 * draws) / k
@@ -0,0 +1,504 @@
+# bench.py
+"""قياسات أداء محركات البحث على مجموعة مواقع ثابتة
+
+    python bench.py pvs --depth 6
+    python bench.py eval --games 500
+    python bench.py batch --depth 6
+    python bench.py batch --mode games --n 1000 10000 100000
+    python bench.py parallel --depth 7 --workers 1 2 4 8 16
+    python bench.py smp --depth 8 --workers 1 2 4 8
+    python bench.py solver --count 20
+    python bench.py mcts --ms 100 300 1000
+    python bench.py rollouts --batch 1 16 64 256 1024
+    python bench.py multipv --depth 7 --k 3
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from game import Connect4Game, BoardSpec
+from ai import MinimaxAlphaBeta, NegamaxPVS
+from levels import HardAI
+from evaluation import IncrementalEvaluator
+from solver import Solver, SolverBudgetExceeded
+from mcts import MCTS
+from batch import BatchConnect4, rollout_stats
+
+# مواقع ثابتة (تسلسل أعمدة من البداية) من الافتتاح حتى وسط اللعبة
+POSITIONS = [
+    [],
+    [3, 3, 2],
+    [3, 2, 4, 4, 2, 3],
+    [3, 3, 3, 3, 2, 4, 2, 4, 1],
+    [3, 4, 3, 4, 2, 2, 5, 1, 0, 6],
+    [3, 3, 4, 2, 5, 6, 2, 4, 4, 3, 1, 2],
+    [2, 3, 3, 4, 4, 5, 4, 5, 6, 6, 5, 2, 1, 0],
+]
+
+
+def make_position(moves):
+    game = Connect4Game()
+    for col in moves:
+        game.play(col)
+    return game
+
+
+def run_engine(engine_class, depth, seed, **options):
+    """مجموع العقد والوقت لكل المواقع، مع بذرة ثابتة لكل موقع
+
+    options تضبط كسمات على كل محرك قبل البحث.
+    """
+    rows = []
+    for moves in POSITIONS:
+        game = make_position(moves)
+        engine = engine_class(game.turn, depth, seed=seed)
+        for name, value in options.items():
+            setattr(engine, name, value)
+        start = time.perf_counter()
+        move = engine.get_best_move(game)
+        rows.append((len(moves), move, engine.nodes_evaluated, time.perf_counter() - start,
+                     engine.first_move_cutoff_rate()))
+    return rows
+
+
+def bench_pvs(args):
+    base = run_engine(MinimaxAlphaBeta, args.depth, args.seed)
+    pvs = run_engine(NegamaxPVS, args.depth, args.seed)
+    # نفس PVS بنافذة كاملة في كل تكرار: الفرق هو توفير نوافذ الطموح
+    full = run_engine(NegamaxPVS, args.depth, args.seed, aspiration_window=None)
+    print(f"depth {args.depth}")
+    print(f"{'ply':>4} {'minimax':>10} {'pvs':>10} {'ratio':>7} {'no asp':>10}   "
+          f"first-move cutoffs   moves")
+    for (ply, m1, n1, _, f1), (_, m2, n2, _, f2), (_, _, n3, _, _) in zip(base, pvs, full):
+        print(f"{ply:>4} {n1:>10} {n2:>10} {n2 / n1:>7.2f} {n3:>10}   "
+              f"{f1:>7.1%} / {f2:>7.1%}    {m1} / {m2}")
+    n1 = sum(row[2] for row in base)
+    n2 = sum(row[2] for row in pvs)
+    n3 = sum(row[2] for row in full)
+    t1 = sum(row[3] for row in base)
+    t2 = sum(row[3] for row in pvs)
+    print(f"{'sum':>4} {n1:>10} {n2:>10} {n2 / n1:>7.2f} {n3:>10}")
+    print(f"aspiration windows: {n2 / n3:.2f} of the nodes without them")
+    print(f"time {t1:.2f}s / {t2:.2f}s")
+
+
+def bench_eval(args):
+    """مقارنة المقيم التدريجي والمقيم الدفعي بالتقييم الكامل على ألعاب عشوائية"""
+    rng = random.Random(args.seed)
+    checked = 0
+    for spec in (BoardSpec(), BoardSpec(5, 8, 3), BoardSpec(7, 9, 5)):
+        engines = [MinimaxAlphaBeta(player, 1, spec=spec) for player in (1, 2)]
+        engines += [HardAI(player, spec) for player in (1, 2)]
+        positions = []
+        for _ in range(args.games):
+            game = Connect4Game(spec)
+            tracked = game.copy()
+            tracked.attach_evaluator(IncrementalEvaluator(spec))
+            while not game.game_over:
+                col = rng.choice([c for c in range(spec.cols) if game.is_valid_location(c)])
+                # أحياناً نلعب ونتراجع لاختبار remove
+                if rng.random() < 0.3:
+                    tracked.play(col)
+                    tracked.undo()
+                game.play(col)
+                tracked.play(col)
+                positions.append(game.copy())
+                for engine in engines[:2]:
+                    expected = engine._evaluate_board(game)
+                    actual = engine._evaluate_board(tracked)
+                    if expected != actual:
+                        raise AssertionError(f"{spec} {game.board.tolist()}: {expected} != {actual}")
+                    checked += 1
+        
+        boards = np.stack([game.board for game in positions])
+        for engine in engines:
+            expected = [engine._evaluate_board(game) for game in positions]
+            actual = engine._evaluate_batch(boards).tolist()
+            if expected != actual:
+                raise AssertionError(f"{spec} {type(engine).__name__}: batch evaluation differs")
+            checked += len(expected)
+    print(f"{checked} evaluations match")
+    
+    # سرعة تقييم الورقة على مواقع المجموعة الثابتة
+    engine = MinimaxAlphaBeta(1, 1)
+    for label, attach in (("full", False), ("incremental", True)):
+        games = [make_position(moves) for moves in POSITIONS]
+        if attach:
+            for game in games:
+                game.attach_evaluator(IncrementalEvaluator())
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for game in games:
+                engine._evaluate_board(game)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>12}: {elapsed / (args.repeat * len(games)) * 1e6:.1f} us/leaf")
+    
+    for n in (7, 1000, 100000):
+        boards = np.stack([make_position(moves).board for moves in POSITIONS] * (n // len(POSITIONS) + 1))[:n]
+        repeat = max(1, args.repeat * 7 // n)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            engine._evaluate_batch(boards)
+        elapsed = time.perf_counter() - start
+        print(f"{'batch ' + str(n):>12}: {elapsed / (repeat * n) * 1e6:.1f} us/leaf")
+
+
+def bench_batch(args):
+    """البحث مع batch_leaves وبدونه: نفس الحركات، والعقد والوقت
+
+    مع --mode games: سرعة BatchConnect4 (drop، فحص الفوز، rollout) لكل N في --n.
+    """
+    if args.mode == "games":
+        bench_batch_games(args)
+        return
+    for engine_class in (MinimaxAlphaBeta, NegamaxPVS):
+        for batch in (False, True):
+            nodes = 0
+            moves = []
+            start = time.perf_counter()
+            for position in POSITIONS:
+                game = make_position(position)
+                engine = engine_class(game.turn, args.depth, seed=args.seed, batch_leaves=batch)
+                moves.append(engine.get_best_move(game))
+                nodes += engine.nodes_evaluated
+            elapsed = time.perf_counter() - start
+            print(f"{engine_class.__name__:>16} batch_leaves={batch!s:<5} "
+                  f"{nodes:>8} nodes {elapsed:6.2f}s  {moves}")
+
+
+def bench_batch_games(args):
+    """BatchConnect4 مع N لعبة: أحجار drop في الثانية، فحوص الفوز في الثانية، وألعاب rollout في الثانية"""
+    rng = np.random.default_rng(args.seed)
+    print(f"{'N':>8} {'drop stones/s':>14} {'win checks/s':>13} {'rollout games/s':>16}")
+    for n in args.n:
+        # drop: ألعاب عشوائية كاملة، ووقت drop وحده (بدون اختيار الحركات)
+        games = BatchConnect4(n)
+        stones = 0
+        drop_time = 0.0
+        while not games.game_over.all():
+            cols = games.random_moves(rng)
+            start = time.perf_counter()
+            stones += int(games.drop(cols).sum())
+            drop_time += time.perf_counter() - start
+        
+        # فحص الفوز لخانة الحركة التالية في مواقع وسط اللعبة (كل الألعاب جارية)
+        games = BatchConnect4(n)
+        for _ in range(12):
+            games.drop(games.random_moves(rng))
+        games.reset()
+        cols = games.random_moves(rng)
+        r = games.spec.rows - 1 - games.heights[games._index, cols].astype(np.intp)
+        player = games.turn
+        repeat = max(1, 1000000 // n)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            games._wins_at(games._index, r, cols, player)
+        check_time = time.perf_counter() - start
+        
+        games = BatchConnect4(n)
+        start = time.perf_counter()
+        games.rollout(rng)
+        rollout_time = time.perf_counter() - start
+        print(f"{n:>8} {stones / drop_time:>14.0f} {n * repeat / check_time:>13.0f} "
+              f"{n / rollout_time:>16.0f}")
+
+
+def bench_parallel(args):
+    """منحنى التسريع للبحث المتوازي في الجذر (العمليات تنشأ قبل القياس)"""
+    print(f"depth {args.depth}, {os.cpu_count()} cpu(s)")
+    baseline = None
+    for workers in args.workers:
+        engine = MinimaxAlphaBeta(1, args.depth, seed=args.seed, workers=workers)
+        try:
+            engine.get_best_move(make_position([]), max_depth=1)
+            nodes = 0
+            moves = []
+            start = time.perf_counter()
+            for position in POSITIONS:
+                game = make_position(position)
+                # تغيير اللاعب يفرغ جدول التبديل (قيمه من منظور اللاعب السابق)
+                engine._set_perspective(game.turn)
+                moves.append(engine.get_best_move(game))
+                nodes += engine.nodes_evaluated
+            elapsed = time.perf_counter() - start
+        finally:
+            engine.close()
+        baseline = baseline or elapsed
+        print(f"{workers:>3} workers {elapsed:7.2f}s  speedup {baseline / elapsed:5.2f}  "
+              f"{nodes:>8} nodes  {moves}")
+
+
+def bench_smp(args):
+    """Lazy SMP: الوقت للوصول إلى العمق والعقد في الثانية حسب عدد العمليات"""
+    print(f"depth {args.depth}, {os.cpu_count()} cpu(s)")
+    for workers in args.workers:
+        engine = MinimaxAlphaBeta(1, args.depth, workers=workers, parallel="lazy_smp")
+        try:
+            engine.get_best_move(make_position([]), max_depth=1)
+            main_nodes = helper_nodes = 0
+            start = time.perf_counter()
+            for position in POSITIONS:
+                game = make_position(position)
+                # تغيير اللاعب يفرغ جدول التبديل (قيمه من منظور اللاعب السابق)
+                engine._set_perspective(game.turn)
+                engine.get_best_move(game)
+                main_nodes += engine.nodes_evaluated
+                helper_nodes += engine.helper_nodes
+            elapsed = time.perf_counter() - start
+        finally:
+            engine.close()
+        total = main_nodes + helper_nodes
+        print(f"{workers:>3} processes  time-to-depth {elapsed / len(POSITIONS):6.3f}s/position  "
+              f"main {main_nodes:>8} nodes  all {total:>8} nodes  {total / elapsed:>8.0f} nps")
+
+
+# مجموعات مواقع الحل: (الاسم، أقل عدد حركات، أكثر عدد حركات)
+SOLVER_SETS = [
+    ("end", 28, 34),
+    ("middle", 18, 27),
+    ("begin", 10, 17),
+]
+# مدى عدد الأحجار لفحص Solver.outcome بالبحث الشامل
+OUTCOME_CHECK_MOVES = (30, 35)
+
+
+def random_positions(count, min_moves, max_moves, rng):
+    """مواقع عشوائية غير منتهية لا يستطيع صاحب الدور فيها الفوز بحركة واحدة"""
+    positions = []
+    while len(positions) < count:
+        game = Connect4Game()
+        for _ in range(rng.randint(min_moves, max_moves)):
+            moves = [c for c in range(game.spec.cols) if game.is_valid_location(c)]
+            col = rng.choice(moves)
+            if game.is_winning_move(col):
+                break
+            game.play(col)
+        else:
+            if not any(game.is_winning_move(c) for c in range(game.spec.cols)
+                       if game.is_valid_location(c)):
+                positions.append(game)
+    return positions
+
+
+def bench_solver(args):
+    """الحل التام على مجموعات مواقع مولدة محلياً: الوقت والعقد لكل موقع"""
+    rng = random.Random(args.seed)
+    solver = Solver()
+    print(f"{'set':>7} {'solved':>8} {'mean time':>10} {'mean nodes':>11} {'nps':>9}")
+    for name, min_moves, max_moves in SOLVER_SETS:
+        solved = nodes = 0
+        elapsed = 0.0
+        for game in random_positions(args.count, min_moves, max_moves, rng):
+            solver.reset()
+            start = time.perf_counter()
+            try:
+                solver.solve(game, weak=args.weak, node_budget=args.budget)
+                solved += 1
+            except SolverBudgetExceeded:
+                pass
+            elapsed += time.perf_counter() - start
+            nodes += solver.nodes
+        print(f"{name:>7} {solved:>4}/{args.count:<3} {elapsed / args.count:>9.4f}s "
+              f"{nodes / args.count:>11.0f} {nodes / elapsed:>9.0f}")
+
+    # Solver.outcome مقابل بحث شامل في مواقع قريبة من النهاية
+    correct = 0
+    positions = random_positions(args.count, OUTCOME_CHECK_MOVES[0], OUTCOME_CHECK_MOVES[1], rng)
+    for game in positions:
+        moves = game.bitboard.moves
+        value = exhaustive_value(game, {})
+        plies = game.spec.size + 1 - abs(value) - moves
+        expected = ("draw" if value == 0 else "win" if value > 0 else "loss",
+                    plies if value else game.spec.size - moves)
+        correct += solver.outcome(solver.solve(game), moves) == expected
+    print(f"outcome {correct}/{len(positions)} match exhaustive search "
+          f"({OUTCOME_CHECK_MOVES[0]}-{OUTCOME_CHECK_MOVES[1]} stones)")
+
+
+def exhaustive_value(game, memo):
+    """بحث شامل بدون تقليم: size + 1 - حركة الفوز (موجبة لصاحب الدور)، أو 0 للتعادل
+
+    الفائز يفضل الفوز الأسرع والخاسر يؤخر الخسارة.
+    """
+    key = game.key()
+    if key in memo:
+        return memo[key]
+    size = game.spec.size
+    moves = game.bitboard.moves
+    columns = [c for c in range(game.spec.cols) if game.is_valid_location(c)]
+    if any(game.is_winning_move(c) for c in columns):
+        value = size - moves
+    elif moves == size:
+        value = 0
+    else:
+        value = -size
+        for col in columns:
+            game.play(col)
+            value = max(value, -exhaustive_value(game, memo))
+            game.undo()
+    memo[key] = value
+    return value
+
+
+def bench_mcts(args):
+    """MCTS مقابل Alpha-Beta بنفس الوقت لكل حركة: محاكاة/ث، عقد/ث، والحركات"""
+    print(f"{'ms':>6} {'playouts/s':>11} {'playouts':>9} {'ab nodes/s':>11} {'ab depth':>9}   moves (mcts / ab)")
+    for ms in args.ms:
+        playouts = nodes = depth = 0
+        mcts_time = ab_time = 0.0
+        mcts_moves, ab_moves = [], []
+        for moves in POSITIONS:
+            game = make_position(moves)
+            mcts = MCTS(game.turn, args.c, seed=args.seed)
+            mcts_moves.append(mcts.get_best_move(game, time_limit_ms=ms))
+            playouts += mcts.playouts_done
+            mcts_time += mcts.elapsed
+            ab = MinimaxAlphaBeta(game.turn, game.spec.size, seed=args.seed)
+            start = time.perf_counter()
+            ab_moves.append(ab.get_best_move(game, time_limit_ms=ms))
+            ab_time += time.perf_counter() - start
+            nodes += ab.nodes_evaluated
+            depth += ab.completed_depth
+        print(f"{ms:>6} {playouts / mcts_time:>11.0f} {playouts / len(POSITIONS):>9.0f} "
+              f"{nodes / ab_time:>11.0f} {depth / len(POSITIONS):>9.1f}   {mcts_moves} / {ab_moves}")
+
+
+def bench_rollouts(args):
+    """ألعاب عشوائية في الثانية حسب حجم الدفعة، مقابل محاكاة MCTS الفردية"""
+    games = [make_position(moves) for moves in POSITIONS]
+    rng = np.random.default_rng(args.seed)
+    
+    engine = MCTS(1, seed=args.seed)
+    start = time.perf_counter()
+    for game in games:
+        bb = game.bitboard
+        for _ in range(args.playouts // len(games)):
+            engine._playout(bb.current, bb.mask, bb.moves)
+    elapsed = time.perf_counter() - start
+    print(f"{'scalar':>8} {args.playouts / elapsed:>10.0f} playouts/s  (with win/block checks)")
+    
+    for size in args.batch:
+        calls = max(1, args.playouts // (size * len(games)))
+        totals = [0, 0, 0]
+        start = time.perf_counter()
+        for game in games:
+            for _ in range(calls):
+                for i, count in enumerate(rollout_stats(game, size, rng)):
+                    totals[i] += count
+        elapsed = time.perf_counter() - start
+        played = sum(totals)
+        print(f"{size:>8} {played / elapsed:>10.0f} playouts/s  "
+              f"win/draw/loss {totals[0] / played:.2f}/{totals[1] / played:.2f}/{totals[2] / played:.2f}")
+    
+    for size in args.batch:
+        engine = MCTS(1, seed=args.seed, rollout_batch=size)
+        game = make_position([])
+        move = engine.get_best_move(game, time_limit_ms=args.ms)
+        print(f"mcts rollout_batch={size:<5} {engine.playouts_per_second():>10.0f} playouts/s  move {move}")
+
+
+def bench_multipv(args):
+    """analyze (حلقة واحدة وجدول واحد) مقابل بحث مستقل لكل عمود بمحرك جديد"""
+    print(f"depth {args.depth}")
+    print(f"{'ply':>4} {'all':>8} {'top k':>8} {'separate':>9}   ranking")
+    totals = [0.0, 0.0, 0.0]
+    for moves in POSITIONS:
+        game = make_position(moves)
+        engine = NegamaxPVS(game.turn, args.depth, seed=args.seed)
+        start = time.perf_counter()
+        ranked = engine.analyze(game)
+        all_time = time.perf_counter() - start
+        
+        engine = NegamaxPVS(game.turn, args.depth, seed=args.seed)
+        start = time.perf_counter()
+        engine.analyze(game, k=args.k)
+        top_time = time.perf_counter() - start
+        
+        # كل عمود: تعميق تكراري كامل للموقع بعده (قيمته من منظور صاحب الدور)
+        start = time.perf_counter()
+        for col in range(game.spec.cols):
+            if not game.is_valid_location(col):
+                continue
+            child = game.copy()
+            child.play(col)
+            if not child.game_over:
+                NegamaxPVS(child.turn, args.depth - 1, seed=args.seed).get_best_move(child)
+        separate_time = time.perf_counter() - start
+        
+        for i, value in enumerate((all_time, top_time, separate_time)):
+            totals[i] += value
+        print(f"{len(moves):>4} {all_time:>7.3f}s {top_time:>7.3f}s {separate_time:>8.3f}s   "
+              f"{[(col, score) for col, score, _ in ranked]}")
+    print(f"{'sum':>4} {totals[0]:>7.3f}s {totals[1]:>7.3f}s {totals[2]:>8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    pvs = commands.add_parser("pvs", help="عقد NegamaxPVS مقابل MinimaxAlphaBeta بنفس العمق")
+    pvs.add_argument("--depth", type=int, default=6)
+    pvs.add_argument("--seed", type=int, default=1)
+    pvs.set_defaults(func=bench_pvs)
+    
+    evaluation = commands.add_parser("eval", help="تطابق وسرعة المقيم التدريجي والدفعي")
+    evaluation.add_argument("--games", type=int, default=200)
+    evaluation.add_argument("--repeat", type=int, default=2000)
+    evaluation.add_argument("--seed", type=int, default=1)
+    evaluation.set_defaults(func=bench_eval)
+    
+    batch = commands.add_parser("batch", help="البحث مع تقييم أوراق العمق 1 دفعة واحدة")
+    batch.add_argument("--mode", choices=["leaves", "games"], default="leaves",
+                       help="leaves: batch_leaves في البحث، games: سرعة BatchConnect4")
+    batch.add_argument("--depth", type=int, default=6)
+    batch.add_argument("--n", type=int, nargs="+", default=[1000, 10000, 100000],
+                       help="عدد الألعاب المتوازية (--mode games)")
+    batch.add_argument("--seed", type=int, default=1)
+    batch.set_defaults(func=bench_batch)
+    
+    parallel = commands.add_parser("parallel", help="تسريع البحث المتوازي في الجذر")
+    parallel.add_argument("--depth", type=int, default=7)
+    parallel.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parallel.add_argument("--seed", type=int, default=1)
+    parallel.set_defaults(func=bench_parallel)
+    
+    smp = commands.add_parser("smp", help="Lazy SMP مع جدول تبديل مشترك")
+    smp.add_argument("--depth", type=int, default=8)
+    smp.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    smp.set_defaults(func=bench_smp)
+    
+    solver = commands.add_parser("solver", help="الحل التام على مواقع عشوائية (نهاية، وسط، بداية)")
+    solver.add_argument("--count", type=int, default=20)
+    solver.add_argument("--budget", type=int, default=2000000, help="أقصى عدد عقد للموقع")
+    solver.add_argument("--weak", action="store_true", help="فوز/تعادل/خسارة فقط")
+    solver.add_argument("--seed", type=int, default=1)
+    solver.set_defaults(func=bench_solver)
+    
+    mcts = commands.add_parser("mcts", help="محاكاة MCTS في الثانية مقابل Alpha-Beta بنفس الوقت")
+    mcts.add_argument("--ms", type=int, nargs="+", default=[100, 300, 1000])
+    mcts.add_argument("--c", type=float, default=1.41, help="ثابت الاستكشاف c_param")
+    mcts.add_argument("--seed", type=int, default=1)
+    mcts.set_defaults(func=bench_mcts)
+    
+    rollouts = commands.add_parser("rollouts", help="ألعاب عشوائية بعمليات NumPy حسب حجم الدفعة")
+    rollouts.add_argument("--batch", type=int, nargs="+", default=[1, 16, 64, 256, 1024])
+    rollouts.add_argument("--playouts", type=int, default=20000, help="عدد الألعاب لكل حجم")
+    rollouts.add_argument("--ms", type=int, default=500, help="وقت MCTS لكل حجم دفعة")
+    rollouts.add_argument("--seed", type=int, default=1)
+    rollouts.set_defaults(func=bench_rollouts)
+    
+    multipv = commands.add_parser("multipv", help="تحليل متعدد الخطوط مقابل بحث منفصل لكل عمود")
+    multipv.add_argument("--depth", type=int, default=7)
+    multipv.add_argument("--k", type=int, default=3)
+    multipv.add_argument("--seed", type=int, default=1)
+    multipv.set_defaults(func=bench_multipv)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# book.py
+"""كتاب افتتاح على القرص: (مفتاح الموقع -> أفضل حركة وقيمتها) لكل المواقع حتى عمق ply
+
+الموقع وانعكاسه يمين/يسار مدخل واحد بالمفتاح الأصغر (canonical_key)،
+والحركة تخزن بنفس اتجاهه وتعكس عند القراءة.
+
+    python book.py build book.bin --ply 4 --depth 8
+    python book.py probe book.bin 3 3 2
+"""
+import argparse
+import mmap
+import struct
+import time
+
+from game import BoardSpec, BitBoard, Connect4Game
+from solver import Solver, SolverBudgetExceeded
+
+MAGIC = b"C4BK"
+VERSION = 2
+# الرأس: السحر، الإصدار، الصفوف، الأعمدة، عدد الفوز، ply (مع حشو حتى 16 بايت)
+HEADER = struct.Struct("<4sHBBBB6x")
+# المدخل: المفتاح المعياري (الأصغر من position + mask وانعكاسه)، العمود، القيمة
+RECORD = struct.Struct("<Qbb")
+# قيمة مدخل حركته من البحث العادي (لم يحل الموقع تماماً)
+UNKNOWN_SCORE = -128
+
+
+class OpeningBook:
+    """قراءة كتاب مرتب من ملف بـ mmap والبحث الثنائي فيه
+
+    الملف لا يحمل إلى الذاكرة: الصفحات تقرأ عند الحاجة وتتشاركها كل العمليات
+    عبر ذاكرة نظام التشغيل. عند النقل لعملية أخرى يعاد فتح الملف بالمسار.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, cols, connect, ply = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not an opening book (version {VERSION})")
+        self.spec = BoardSpec(rows, cols, connect)
+        self.ply = ply
+        self.size = (len(self.data) - HEADER.size) // RECORD.size
+
+    def __reduce__(self):
+        return (OpeningBook, (self.path,))
+
+    def __len__(self):
+        return self.size
+
+    def lookup(self, key):
+        """(العمود، القيمة أو None) للمفتاح المعياري key، أو None إذا لم يكن في الكتاب"""
+        data = self.data
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            k, col, score = RECORD.unpack_from(data, HEADER.size + mid * RECORD.size)
+            if k < key:
+                lo = mid + 1
+            elif k > key:
+                hi = mid
+            else:
+                return col, None if score == UNKNOWN_SCORE else score
+        return None
+
+    def probe(self, game):
+        """(العمود، القيمة أو None) للموقع الحالي في game بنفس اتجاهه، أو None"""
+        if game.spec != self.spec or game.bitboard.moves > self.ply:
+            return None
+        key = game.key()
+        mirrored = self.spec.mirror(key)
+        entry = self.lookup(min(key, mirrored))
+        if entry is None:
+            return None
+        col, score = entry
+        return (self.spec.mirror_move(col) if mirrored < key else col), score
+
+    def best_move(self, game):
+        """حركة الكتاب للموقع الحالي في game، أو None"""
+        entry = self.probe(game)
+        if entry is None or not game.is_valid_location(entry[0]):
+            return None
+        return entry[0]
+
+    def close(self):
+        self.data.close()
+
+
+def positions_up_to(ply, spec):
+    """كل المواقع غير المنتهية حتى ply حركة: {المفتاح المعياري: تسلسل الأعمدة}"""
+    positions = {}
+    frontier = {BitBoard(spec).canonical_key(): []}
+    for moves in range(ply + 1):
+        positions.update(frontier)
+        if moves == ply:
+            break
+        following = {}
+        for sequence in frontier.values():
+            board = BitBoard(spec)
+            for col in sequence:
+                board.play(col)
+            for col in range(spec.cols):
+                # الحركة الفائزة تنهي اللعبة، واللوحة الممتلئة لا تتابع
+                if not board.can_play(col) or board.is_winning_move(col):
+                    continue
+                board.play(col)
+                if not board.is_full():
+                    following.setdefault(board.canonical_key(), sequence + [col])
+                board.switch()
+                board.undo(col)
+        frontier = following
+    return positions
+
+
+def build_book(path, ply, spec=None, depth=8, node_budget=200000, verbose=False):
+    """بناء الكتاب: الحل التام ضمن node_budget، وإلا NegamaxPVS بعمق depth
+
+    يعيد عدد المدخلات.
+    """
+    from ai import NegamaxPVS
+
+    spec = BoardSpec() if spec is None else spec
+    if spec.cols * spec.h1 > 64:
+        raise ValueError(f"{spec} keys do not fit in 64 bits")
+    solver = Solver(spec)
+    engines = {player: NegamaxPVS(player, depth, spec=spec, seed=0) for player in (1, 2)}
+
+    records = []
+    start = time.perf_counter()
+    for key, sequence in sorted(positions_up_to(ply, spec).items()):
+        game = Connect4Game(spec)
+        for col in sequence:
+            game.play(col)
+        try:
+            scores = solver.analyze(game, node_budget)
+            best = max(scores.values())
+            # عند التساوي الأقرب للمركز (ترتيب analyze)
+            col = next(c for c, s in scores.items() if s == best)
+            score = best
+        except SolverBudgetExceeded:
+            col = engines[game.turn].get_best_move(game)
+            score = UNKNOWN_SCORE
+        if game.key() != key:
+            col = spec.mirror_move(col)
+        records.append(RECORD.pack(key, col, score))
+        if verbose:
+            print(f"{len(records):>6}  {sequence}  -> {col} ({score})  "
+                  f"{time.perf_counter() - start:.1f}s")
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, spec.rows, spec.cols, spec.connect, ply))
+        f.write(b"".join(records))
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="بناء كتاب لكل المواقع حتى ply")
+    build.add_argument("path")
+    build.add_argument("--ply", type=int, default=4)
+    build.add_argument("--depth", type=int, default=8, help="عمق البحث للمواقع التي لم تحل")
+    build.add_argument("--budget", type=int, default=200000, help="أقصى عدد عقد للحل التام")
+    build.add_argument("--rows", type=int, default=6)
+    build.add_argument("--cols", type=int, default=7)
+    build.add_argument("--connect", type=int, default=4)
+    build.add_argument("-v", "--verbose", action="store_true")
+
+    probe = commands.add_parser("probe", help="حركة الكتاب بعد تسلسل أعمدة")
+    probe.add_argument("path")
+    probe.add_argument("moves", type=int, nargs="*")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        spec = BoardSpec(args.rows, args.cols, args.connect)
+        count = build_book(args.path, args.ply, spec, args.depth, args.budget, args.verbose)
+        print(f"{count} positions written to {args.path}")
+    else:
+        book = OpeningBook(args.path)
+        game = Connect4Game(book.spec)
+        for col in args.moves:
+            game.play(col)
+        print(book.probe(game))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+# evaluation.py
+from functools import lru_cache
+
+import numpy as np
+from game import DEFAULT_SPEC, HORIZONTAL, VERTICAL, DIAGONAL, ANTI_DIAGONAL
+
+# وزن نوافذ كل اتجاه في _evaluate_board
+DIRECTION_WEIGHTS = {HORIZONTAL: 12, VERTICAL: 8, DIAGONAL: 15, ANTI_DIAGONAL: 15}
+
+# أوزان الموقع: عمود المركز والأعمدة المجاورة له (±1، ±2)
+CENTER_WEIGHT = 1
+NEAR_CENTER_WEIGHT = 2
+NEAR_CENTER_OFFSETS = (-1, 1, -2, 2)
+
+# مكافأة لكل عمود مستخدم، وعقوبة تركيز أكثر من 70% من الأحجار في عمود واحد
+DIVERSITY_BONUS = 8
+CONCENTRATION_LIMIT = 0.7
+CONCENTRATION_PENALTY = 100
+
+# قيمة الفوز/الخسارة المؤكدة
+WIN_SCORE = 1000000
+
+# قيمة نافذة فيها أحجار طرف واحد فقط، حسب عدد الخانات الناقصة للفوز
+OWN_WINDOW_VALUES = {0: 1000, 1: 80, 2: 15}
+OPPONENT_WINDOW_VALUES = {1: -70, 2: -10}
+
+# أطول خط كامل يرمز كرقم واحد (3**8 نمط، أو 3**connect إذا كان أكبر)، والأطول يقسم لقطع متداخلة
+MAX_SEGMENT_LENGTH = 8
+
+
+def window_score(player_count, opponent_count, n):
+    """قيمة نافذة بطول n من منظور اللاعب حسب عدد أحجاره وأحجار خصمه"""
+    if opponent_count == 0 and n - player_count in OWN_WINDOW_VALUES:
+        return OWN_WINDOW_VALUES[n - player_count]
+    if player_count == 0 and n - opponent_count in OPPONENT_WINDOW_VALUES:
+        return OPPONENT_WINDOW_VALUES[n - opponent_count]
+    return 0
+
+
+def pattern_index(cells):
+    """ترميز ثلاثي لتسلسل خانات (0 فارغ، 1، 2)، الخانة الأولى هي الأعلى قيمة"""
+    index = 0
+    for cell in cells:
+        index = index * 3 + cell
+    return index
+
+
+def pattern_digits(index, length):
+    """عكس pattern_index"""
+    digits = [0] * length
+    for k in range(length - 1, -1, -1):
+        index, digits[k] = divmod(index, 3)
+    return digits
+
+
+class PatternTables:
+    """قيم كل نمط ممكن لنافذة أو لخط كامل، مبنية من أوزان هذا الملف
+
+    - window[player][index]: قيمة _evaluate_window لنافذة بطول connect
+    - segments: كل صف وعمود وقطر بطول connect أو أكثر كتسلسل خانات،
+      وsegment_tables[i][index] مجموع قيم نوافذه الموزونة من منظور اللاعب 1
+    - cell_segments[cell]: (رقم الخط، مضاعف الخانة في ترميزه) للتحديث التدريجي
+    تغيير الأوزان يغير الجداول فقط.
+    """
+
+    def __init__(self, spec=DEFAULT_SPEC):
+        self.spec = spec
+        n = spec.connect
+        size = 3 ** n
+        self.window = [None, [0] * size, [0] * size]
+        for index in range(size):
+            digits = pattern_digits(index, n)
+            ones, twos = digits.count(1), digits.count(2)
+            self.window[1][index] = window_score(ones, twos, n)
+            self.window[2][index] = window_score(twos, ones, n)
+        # قيمة النافذة الموزونة لكل اتجاه من منظور اللاعب 1
+        self.line_window = {
+            direction: [weight * (self.window[1][i] - self.window[2][i]) for i in range(size)]
+            for direction, weight in DIRECTION_WEIGHTS.items()
+        }
+        self.full_window = (pattern_index([1] * n), pattern_index([2] * n))
+
+        self.segments = []
+        self.segment_directions = []
+        for direction, cells in self._full_lines():
+            # قطع متداخلة بـ connect - 1 خانة: كل نافذة في قطعة واحدة فقط
+            # (القطعة تتسع لنافذة واحدة على الأقل حتى لو تجاوز connect الحد)
+            length = max(MAX_SEGMENT_LENGTH, n)
+            step = length - n + 1
+            start = 0
+            while True:
+                self.segments.append(tuple(cells[start:start + length]))
+                self.segment_directions.append(direction)
+                if start + length >= len(cells):
+                    break
+                start += step
+
+        tables = {}
+        self.segment_tables = []
+        for cells, direction in zip(self.segments, self.segment_directions):
+            shape = (direction, len(cells))
+            if shape not in tables:
+                tables[shape] = self._segment_table(direction, len(cells))
+            self.segment_tables.append(tables[shape])
+
+        self.cell_segments = [[] for _ in range(spec.size)]
+        for i, cells in enumerate(self.segments):
+            for k, cell in enumerate(cells):
+                self.cell_segments[cell].append((i, 3 ** (len(cells) - 1 - k)))
+
+    def __reduce__(self):
+        # الجداول تبنى (أو تؤخذ من الذاكرة المؤقتة) بدلاً من نقلها بين العمليات
+        return (pattern_tables, (self.spec,))
+
+    def _full_lines(self):
+        """كل الصفوف والأعمدة والأقطار التي تتسع لنافذة واحدة على الأقل"""
+        rows, cols, n = self.spec.rows, self.spec.cols, self.spec.connect
+        lines = []
+        for direction, (dr, dc) in ((HORIZONTAL, (0, 1)), (VERTICAL, (1, 0)),
+                                    (DIAGONAL, (1, 1)), (ANTI_DIAGONAL, (-1, 1))):
+            for r in range(rows):
+                for c in range(cols):
+                    # بداية الخط فقط: الخانة السابقة خارج اللوحة
+                    if 0 <= r - dr < rows and 0 <= c - dc < cols:
+                        continue
+                    cells = []
+                    rr, cc = r, c
+                    while 0 <= rr < rows and 0 <= cc < cols:
+                        cells.append(rr * cols + cc)
+                        rr, cc = rr + dr, cc + dc
+                    if len(cells) >= n:
+                        lines.append((direction, cells))
+        return lines
+
+    def _segment_table(self, direction, length):
+        n = self.spec.connect
+        line_window = self.line_window[direction]
+        table = []
+        for index in range(3 ** length):
+            digits = pattern_digits(index, length)
+            table.append(sum(line_window[pattern_index(digits[s:s + n])]
+                             for s in range(length - n + 1)))
+        return table
+
+
+@lru_cache(maxsize=None)
+def pattern_tables(spec=DEFAULT_SPEC):
+    """PatternTables مشتركة لكل أبعاد لوحة (تبنى مرة واحدة)"""
+    return PatternTables(spec)
+
+
+class IncrementalEvaluator:
+    """تقييم MinimaxAlphaBeta._evaluate_board محدث مع كل حركة وتراجع
+
+    يحفظ الترميز الثلاثي لكل صف وعمود وقطر ومجموع قيمها من PatternTables،
+    وعدد أحجار كل لاعب في كل عمود. الحركة تكلف أربعة تحديثات (خط لكل اتجاه)،
+    والتقييم عند الورقة لا يمر على اللوحة.
+    """
+
+    def __init__(self, spec=DEFAULT_SPEC):
+        self.spec = spec
+        self.patterns = pattern_tables(spec)
+
+        self.cell_values = []
+        for cell in range(spec.size):
+            r, c = divmod(cell, spec.cols)
+            offset = c - spec.center
+            if offset == 0:
+                value = (spec.rows - r) * CENTER_WEIGHT
+            elif offset in NEAR_CENTER_OFFSETS:
+                value = (spec.rows - r) * NEAR_CENTER_WEIGHT
+            else:
+                value = 0
+            self.cell_values.append(value)
+        self.reset()
+
+    def reset(self, board=None):
+        """تصفير العدادات، أو بناؤها من مصفوفة لوحة"""
+        cols = self.spec.cols
+        self.indices = [0] * len(self.patterns.segments)
+        self.line_score = 0  # مجموع قيم الخطوط من منظور اللاعب 1
+        self.cell_score = [0, 0]
+        self.column_counts = [[0] * cols, [0] * cols]
+        self.columns_used = [0, 0]
+        self.pieces = [0, 0]
+        if board is not None:
+            for cell, piece in enumerate(board.ravel().tolist()):
+                if piece:
+                    self.add(cell, piece)
+
+    def add(self, cell, piece):
+        """حجر للاعب piece في الخانة المسطحة cell (row * cols + col)"""
+        indices = self.indices
+        tables = self.patterns.segment_tables
+        for segment, power in self.patterns.cell_segments[cell]:
+            old = indices[segment]
+            new = old + piece * power
+            indices[segment] = new
+            self.line_score += tables[segment][new] - tables[segment][old]
+
+        i = piece - 1
+        self.cell_score[i] += self.cell_values[cell]
+        column = self.column_counts[i]
+        col = cell % self.spec.cols
+        if column[col] == 0:
+            self.columns_used[i] += 1
+        column[col] += 1
+        self.pieces[i] += 1
+
+    def remove(self, cell, piece):
+        """عكس add لنفس الخانة واللاعب"""
+        indices = self.indices
+        tables = self.patterns.segment_tables
+        for segment, power in self.patterns.cell_segments[cell]:
+            old = indices[segment]
+            new = old - piece * power
+            indices[segment] = new
+            self.line_score += tables[segment][new] - tables[segment][old]
+
+        i = piece - 1
+        self.cell_score[i] -= self.cell_values[cell]
+        column = self.column_counts[i]
+        col = cell % self.spec.cols
+        column[col] -= 1
+        if column[col] == 0:
+            self.columns_used[i] -= 1
+        self.pieces[i] -= 1
+
+    def score(self, player):
+        """نفس قيمة _evaluate_board لموقع لم ينته، من منظور player"""
+        i = player - 1
+        score = self.line_score if player == 1 else -self.line_score
+        score += self.cell_score[i] + self.columns_used[i] * DIVERSITY_BONUS
+        pieces = self.pieces[i]
+        if pieces and max(self.column_counts[i]) / pieces > CONCENTRATION_LIMIT:
+            score -= CONCENTRATION_PENALTY
+        return score
+
+    def copy(self):
+        other = IncrementalEvaluator.__new__(IncrementalEvaluator)
+        other.spec = self.spec
+        other.patterns = self.patterns
+        other.cell_values = self.cell_values
+        other.indices = self.indices[:]
+        other.line_score = self.line_score
+        other.cell_score = self.cell_score[:]
+        other.column_counts = [self.column_counts[0][:], self.column_counts[1][:]]
+        other.columns_used = self.columns_used[:]
+        other.pieces = self.pieces[:]
+        return other
+
+
+class BatchEvaluator:
+    """نفس تقييم _evaluate_board لمصفوفة لوحات (N, rows, cols) في نداء واحد
+
+    الترميز الثلاثي لكل نافذة يحسب بجمع فهارس win_lines مسبقة الحساب
+    مضروبة في قوى 3، ثم تؤخذ قيمتها الموزونة من جداول PatternTables.
+    """
+
+    def __init__(self, spec=DEFAULT_SPEC):
+        self.spec = spec
+        patterns = pattern_tables(spec)
+        n = spec.connect
+        self.windows = np.array(spec.win_lines, dtype=np.intp)  # (lines, connect)
+        self.powers = 3 ** np.arange(n - 1, -1, -1, dtype=np.int64)
+        # line_tables[line, index]: قيمة النافذة الموزونة من منظور اللاعب 1
+        by_direction = {direction: np.array(table, dtype=np.int64)
+                        for direction, table in patterns.line_window.items()}
+        self.line_tables = np.stack([by_direction[d] for d in spec.line_directions])
+        self.line_ids = np.arange(len(spec.win_lines))
+        self.full_window = patterns.full_window
+        self.cell_values = np.array(IncrementalEvaluator(spec).cell_values, dtype=np.int64)
+
+    def __reduce__(self):
+        return (BatchEvaluator, (self.spec,))
+
+    def window_indices(self, boards):
+        """الترميز الثلاثي لكل نافذة: مصفوفة (N, lines)"""
+        flat = np.asarray(boards, dtype=np.int64).reshape(len(boards), -1)
+        return flat[:, self.windows] @ self.powers
+
+    def terminal(self, indices, boards, player):
+        """(قناع المواقع المنتهية، قيمتها من منظور player)"""
+        opponent = 1 if player == 2 else 2
+        won = (indices == self.full_window[player - 1]).any(axis=1)
+        lost = (indices == self.full_window[opponent - 1]).any(axis=1)
+        full = (np.asarray(boards).reshape(len(boards), -1) != 0).all(axis=1)
+        over = won | lost | full
+        values = np.where(won, WIN_SCORE, np.where(lost, -WIN_SCORE, 0))
+        return over, values
+
+    def evaluate(self, boards, player):
+        """مصفوفة N قيمة، مطابقة لـ MinimaxAlphaBeta._evaluate_board لكل لوحة"""
+        spec = self.spec
+        boards = np.asarray(boards)
+        indices = self.window_indices(boards)
+        scores = self.line_tables[self.line_ids, indices].sum(axis=1)
+        if player == 2:
+            scores = -scores
+
+        mine = boards.reshape(len(boards), -1) == player
+        scores += mine.astype(np.int64) @ self.cell_values
+
+        per_column = mine.reshape(len(boards), spec.rows, spec.cols).sum(axis=1)
+        scores += (per_column > 0).sum(axis=1) * DIVERSITY_BONUS
+        pieces = per_column.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            concentrated = (pieces > 0) & (per_column.max(axis=1) / pieces > CONCENTRATION_LIMIT)
+        scores -= concentrated * CONCENTRATION_PENALTY
+
+        over, values = self.terminal(indices, boards, player)
+        return np.where(over, values, scores)
@@ -1,75 +1,481 @@
 # game.py
+import random
 import numpy as np
 
-ROWS = 6
-COLS = 7
+# اتجاهات خطوط الفوز
+HORIZONTAL, VERTICAL, DIAGONAL, ANTI_DIAGONAL = range(4)
+
+# جداول Zobrist ببذرة ثابتة حتى تتطابق المفاتيح بين العمليات
+ZOBRIST_SEED = 0x5EED_C4
+
+
+class BoardSpec:
+    """أبعاد اللوحة (صفوف، أعمدة، عدد القطع للفوز) وكل الجداول المشتقة منها
+
+    تبنى الجداول مرة واحدة عند إنشاء الكائن وتستخدمها اللعبة والـ AI:
+    - win_lines / line_directions: كل خطوط الفوز كفهارس مسطحة (row * cols + col)
+    - cell_lines: الفهرس العكسي خانة -> أرقام الخطوط المارة بها
+    - cell_rays: لكل خانة واتجاه، الخانات حتى connect - 1 خطوة للأمام وللخلف
+    - أقنعة البت بورد وجداول Zobrist
+    """
+
+    def __init__(self, rows=6, cols=7, connect=4):
+        if rows < 1 or cols < 1 or connect < 2:
+            raise ValueError(f"invalid board spec: {rows}x{cols} connect-{connect}")
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.size = rows * cols
+        self.center = cols // 2
+
+        # كل عمود يأخذ rows + 1 بت (بت إضافي فوق العمود كفاصل)
+        self.h1 = rows + 1
+        self.bottom_mask = sum(1 << (c * self.h1) for c in range(cols))
+        self.board_mask = self.bottom_mask * ((1 << rows) - 1)
+        # حد البت لكل عمود، وصف المصفوفة لكل بت (الصف 0 هو الأعلى)
+        self.column_limits = [c * self.h1 + rows for c in range(cols)]
+        self.bit_rows = [rows - 1 - b % self.h1 for b in range(cols * self.h1)]
+        self.cell_bits = [1 << self.bit(cell // cols, cell % cols) for cell in range(self.size)]
+
+        self.win_lines, self.line_directions = self._build_win_lines()
+        self.cell_lines, self.line_masks, self.lines_through = self._build_line_index()
+        self.cell_rays = self._build_cell_rays()
+
+        rng = random.Random(ZOBRIST_SEED)
+        # zobrist[player][bit]، والصف 0 (خانة فارغة) أصفار
+        self.zobrist = [[0] * (cols * self.h1)] + [
+            [rng.getrandbits(64) for _ in range(cols * self.h1)] for _ in range(2)]
+        self.zobrist_turn = rng.getrandbits(64)  # يضاف عندما يكون الدور للاعب 2
+        # الانعكاس يميناً ويساراً: البت المقابل لكل بت، وإزاحات كتل الأعمدة
+        self.mirror_bits = [(cols - 1 - b // self.h1) * self.h1 + b % self.h1
+                            for b in range(cols * self.h1)]
+        self._mirror_shifts = [(c * self.h1, (cols - 1 - c) * self.h1) for c in range(cols)]
+
+    def __repr__(self):
+        return f"BoardSpec(rows={self.rows}, cols={self.cols}, connect={self.connect})"
+
+    def __eq__(self, other):
+        return (isinstance(other, BoardSpec) and
+                (self.rows, self.cols, self.connect) == (other.rows, other.cols, other.connect))
+
+    def __hash__(self):
+        return hash((self.rows, self.cols, self.connect))
+
+    def __reduce__(self):
+        # الجداول تبنى من جديد بدلاً من نقلها بين العمليات
+        return (BoardSpec, (self.rows, self.cols, self.connect))
+
+    def bit(self, row, col):
+        """رقم البت المقابل للخانة (row, col) في المصفوفة"""
+        return col * self.h1 + self.rows - 1 - row
+
+    def mirror(self, bits):
+        """انعكاس قناع أو مفتاح بت بورد: العمود c يصبح cols - 1 - c
+
+        كل عمود كتلة h1 بت مستقلة (المفتاح position + mask لا يحمل بين
+        الأعمدة)، فيكفي نقل الكتل.
+        """
+        column = (1 << self.h1) - 1
+        result = 0
+        for source, target in self._mirror_shifts:
+            result |= ((bits >> source) & column) << target
+        return result
+
+    def mirror_move(self, col):
+        return self.cols - 1 - col
+
+    def _build_win_lines(self):
+        """كل خطوط الفوز بنفس ترتيب خلايا الحلقات الأصلية (69 خطاً في 6x7)"""
+        rows, cols, n = self.rows, self.cols, self.connect
+        lines = []
+        directions = []
+        for direction, (dr, dc), row_range in (
+            (HORIZONTAL, (0, 1), range(rows)),
+            (VERTICAL, (1, 0), range(rows - n + 1)),
+            (DIAGONAL, (1, 1), range(rows - n + 1)),
+            (ANTI_DIAGONAL, (-1, 1), range(n - 1, rows)),
+        ):
+            for r in row_range:
+                for c in range(cols - n + 1 if dc else cols):
+                    lines.append(tuple((r + dr * i) * cols + c + dc * i for i in range(n)))
+                    directions.append(direction)
+        return lines, directions
+
+    def _build_line_index(self):
+        """الفهرس العكسي خانة -> خطوط، وأقنعة البتات لكل خط ولكل بت"""
+        cell_lines = [[] for _ in range(self.size)]
+        for i, line in enumerate(self.win_lines):
+            for cell in line:
+                cell_lines[cell].append(i)
+        line_masks = [sum(self.cell_bits[cell] for cell in line) for line in self.win_lines]
+        lines_through = [[] for _ in range(self.cols * self.h1)]
+        for cell, ids in enumerate(cell_lines):
+            lines_through[self.bit(cell // self.cols, cell % self.cols)] = [line_masks[i] for i in ids]
+        return cell_lines, line_masks, lines_through
+
+    def _build_cell_rays(self):
+        """لكل خانة ولكل اتجاه (0,1) (1,0) (1,1) (1,-1): الخانات حتى connect - 1 خطوة"""
+        rays = []
+        for r in range(self.rows):
+            for c in range(self.cols):
+                cell = []
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    pair = []
+                    for sign in (1, -1):
+                        ray = []
+                        for i in range(1, self.connect):
+                            nr, nc = r + sign * dr * i, c + sign * dc * i
+                            if not (0 <= nr < self.rows and 0 <= nc < self.cols):
+                                break
+                            ray.append(nr * self.cols + nc)
+                        pair.append(tuple(ray))
+                    cell.append(tuple(pair))
+                rays.append(tuple(cell))
+        return rays
+
+
+# اللوحة القياسية 6x7 وأربع قطع للفوز
+DEFAULT_SPEC = BoardSpec()
+ROWS = DEFAULT_SPEC.rows
+COLS = DEFAULT_SPEC.cols
+
+
+def winning_positions(stones, mask, spec):
+    """قناع الخانات الفارغة (خارج mask) التي يكمل فيها حجر من stones خط فوز
+
+    لكل اتجاه ولكل موقع للفراغ داخل الخط نطابق بقية الخانات بالإزاحة، مع
+    صيغة مباشرة (بدون حلقات) للوحات connect-4. صف الحماية فوق كل عمود يمنع
+    الخطوط من الالتفاف بين الأعمدة.
+    """
+    h1 = spec.h1
+    if spec.connect == 4:
+        # رأسي
+        r = (stones << 1) & (stones << 2) & (stones << 3)
+        # أفقي وقطريان
+        for d in (h1, h1 - 1, h1 + 1):
+            p = (stones << d) & (stones << 2 * d)
+            r |= p & (stones << 3 * d)
+            r |= p & (stones >> d)
+            p = (stones >> d) & (stones >> 2 * d)
+            r |= p & (stones << d)
+            r |= p & (stones >> 3 * d)
+        return r & (spec.board_mask ^ mask)
+
+    n = spec.connect
+    r = 0
+    for d in (1, h1, h1 - 1, h1 + 1):
+        for gap in range(n):
+            m = spec.board_mask
+            for k in range(n):
+                if k == gap:
+                    continue
+                shift = (k - gap) * d
+                m &= stones >> shift if shift > 0 else stones << -shift
+            r |= m
+    return r & (spec.board_mask ^ mask)
+
+
+class BitBoard:
+    """تمثيل اللوحة بعددين: أحجار اللاعب الحالي وقناع الخانات المشغولة"""
+
+    def __init__(self, spec=DEFAULT_SPEC):
+        self.spec = spec
+        self.current = 0
+        self.mask = 0
+        # أول بت فارغ في كل عمود
+        self.heights = [c * spec.h1 for c in range(spec.cols)]
+        self.moves = 0
+
+    def can_play(self, col):
+        return self.heights[col] < self.spec.column_limits[col]
+
+    def legal_moves_mask(self):
+        """قناع الخانات التي يمكن اللعب فيها الآن (خانة واحدة لكل عمود)"""
+        return (self.mask + self.spec.bottom_mask) & self.spec.board_mask
+
+    def next_row(self, col):
+        """الصف (في المصفوفة) الذي سيسقط فيه الحجر، أو None إذا امتلأ العمود"""
+        if not self.can_play(col):
+            return None
+        return self.spec.bit_rows[self.heights[col]]
+
+    def drop(self, col):
+        """وضع حجر للاعب الحالي بدون تبديل الدور، ويعيد صف الحجر"""
+        h = self.heights[col]
+        move = 1 << h
+        self.current |= move
+        self.mask |= move
+        self.heights[col] = h + 1
+        self.moves += 1
+        return self.spec.bit_rows[h]
+
+    def undo(self, col):
+        """إزالة آخر حجر في العمود col (يجب أن يكون للاعب الحالي)، ويعيد صفه"""
+        h = self.heights[col] - 1
+        move = 1 << h
+        self.current &= ~move
+        self.mask ^= move
+        self.heights[col] = h
+        self.moves -= 1
+        return self.spec.bit_rows[h]
+
+    def switch(self):
+        """تبديل اللاعب الحالي"""
+        self.current ^= self.mask
+
+    def play(self, col):
+        """لعب حركة ثم تمرير الدور للخصم"""
+        row = self.drop(col)
+        self.switch()
+        return row
+
+    def is_win(self):
+        """هل يملك اللاعب الحالي خط فوز كامل؟"""
+        return self.alignment(self.current)
+
+    def is_full(self):
+        return self.moves == self.spec.size
+
+    def is_winning_move(self, col, opponent=False):
+        """هل يفوز اللاعب الحالي (أو خصمه) بإسقاط حجر في العمود col؟"""
+        stones = self.current ^ self.mask if opponent else self.current
+        h = self.heights[col]
+        stones |= 1 << h
+        for line in self.spec.lines_through[h]:
+            if stones & line == line:
+                return True
+        return False
+
+    def winning_positions(self, stones):
+        """قناع الخانات الفارغة التي يكمل فيها حجر من stones خط فوز"""
+        return winning_positions(stones, self.mask, self.spec)
+
+    def connects(self, bit):
+        """هل يكمل حجر اللاعب الحالي في البت bit خط فوز؟
+
+        يفحص فقط الخطوط المارة بهذه الخانة، فالتكلفة ثابتة مهما امتلأت اللوحة.
+        """
+        stones = self.current
+        for line in self.spec.lines_through[bit]:
+            if stones & line == line:
+                return True
+        return False
+
+    def alignment(self, stones):
+        """فحص connect قطع متتالية بالإزاحة والقناع"""
+        h1 = self.spec.h1
+        # أفقي، قطري (\)، قطري (/)، رأسي
+        for d in (h1, h1 - 1, h1 + 1, 1):
+            m = stones
+            for k in range(1, self.spec.connect):
+                m &= stones >> (k * d)
+            if m:
+                return True
+        return False
+
+    def key(self):
+        """مفتاح فريد للموقع (أحجار اللاعب الحالي + القناع)"""
+        return self.current + self.mask
+
+    def canonical_key(self):
+        """أصغر مفتاحي الموقع وانعكاسه: نفس القيمة للموقعين المتناظرين"""
+        key = self.current + self.mask
+        return min(key, self.spec.mirror(key))
+
+    def copy(self):
+        other = BitBoard.__new__(BitBoard)
+        other.spec = self.spec
+        other.current = self.current
+        other.mask = self.mask
+        other.heights = self.heights[:]
+        other.moves = self.moves
+        return other
+
+    @classmethod
+    def from_array(cls, board, player, spec=DEFAULT_SPEC):
+        """بناء البت بورد من مصفوفة NumPy، مع اعتبار player هو اللاعب الحالي"""
+        bb = cls(spec)
+        cells = np.asarray(board).ravel().tolist()
+        for cell, piece in enumerate(cells):
+            if piece:
+                b = spec.cell_bits[cell]
+                bb.mask |= b
+                if piece == player:
+                    bb.current |= b
+                bb.heights[cell % spec.cols] += 1
+                bb.moves += 1
+        return bb
+
+    def to_array(self, player):
+        """تحويل البت بورد إلى مصفوفة NumPy بنفس تنسيق Connect4Game.board"""
+        spec = self.spec
+        opponent = 1 if player == 2 else 2
+        board = np.zeros((spec.rows, spec.cols), dtype=int)
+        for cell, b in enumerate(spec.cell_bits):
+            if self.mask & b:
+                board[cell // spec.cols][cell % spec.cols] = player if self.current & b else opponent
+        return board
+
 
 class Connect4Game:
-    def __init__(self):
-        self.board = np.zeros((ROWS, COLS), dtype=int)
-        self.turn = 1  # 1 for Player 1, 2 for Player 2
+    def __init__(self, spec=None):
+        self.spec = DEFAULT_SPEC if spec is None else spec
+        self._board = np.zeros((self.spec.rows, self.spec.cols), dtype=int)
+        self.bitboard = BitBoard(self.spec)
+        self._turn = 1  # 1 for Player 1, 2 for Player 2
         self.game_over = False
         self.winner = None
         self.last_move = None
+        self.hash = 0  # Zobrist key (64 بت) يحدث مع كل حركة وتراجع
+        self.mirror_hash = 0  # مفتاح Zobrist للوحة المعكوسة يميناً ويساراً
+        # مكدس الحركات: (العمود، الدور، الفائز، انتهاء اللعبة، آخر حركة) قبل كل حركة
+        self._history = []
+        # مقيم تدريجي اختياري (evaluation.IncrementalEvaluator) يتبع كل حركة وتراجع
+        self.evaluator = None
+
+    @property
+    def board(self):
+        return self._board
+
+    @board.setter
+    def board(self, board):
+        self._board = board
+        self.bitboard = BitBoard.from_array(board, self._turn, self.spec)
+        self._history = []
+        self.hash = self._compute_hash()
+        self.mirror_hash = self._compute_hash(mirror=True)
+        if self.evaluator is not None:
+            self.evaluator.reset(board)
+
+    @property
+    def turn(self):
+        return self._turn
+
+    @turn.setter
+    def turn(self, turn):
+        # البت بورد يحفظ أحجار صاحب الدور دائماً
+        if turn != self._turn:
+            self.bitboard.switch()
+            self.hash ^= self.spec.zobrist_turn
+            self.mirror_hash ^= self.spec.zobrist_turn
+        self._turn = turn
+
+    def _compute_hash(self, mirror=False):
+        """حساب مفتاح Zobrist من الصفر (للوحة المعكوسة مع mirror)"""
+        spec = self.spec
+        h = spec.zobrist_turn if self._turn == 2 else 0
+        for cell, piece in enumerate(self._board.ravel().tolist()):
+            if piece:
+                bit = spec.bit(cell // spec.cols, cell % spec.cols)
+                h ^= spec.zobrist[piece][spec.mirror_bits[bit] if mirror else bit]
+        return h
+
+    def key(self):
+        """مفتاح فريد ومضغوط للموقع (position + mask) للبحث الدقيق"""
+        return self.bitboard.key()
+
+    def canonical_key(self):
+        return self.bitboard.canonical_key()
+
+    def canonical(self):
+        """(مفتاح Zobrist، المفتاح الفريد، هل انعكس) للاتجاه ذي المفتاح الأصغر
+
+        الموقع وانعكاسه يعطيان نفس المفتاحين، والحركات المخزنة بهما تعكس
+        (spec.mirror_move) عندما يكون mirrored صحيحاً.
+        """
+        key = self.bitboard.key()
+        mirrored = self.spec.mirror(key)
+        if mirrored < key:
+            return self.mirror_hash, mirrored, True
+        return self.hash, key, False
+
+    def attach_evaluator(self, evaluator):
+        """ربط مقيم تدريجي يبنى من اللوحة الحالية ثم يحدث مع play/undo (None لفكه)"""
+        self.evaluator = evaluator
+        if evaluator is not None:
+            evaluator.reset(self._board)
 
     def drop_piece(self, col):
-        if not (0 <= col < COLS):
+        if not self.is_valid_location(col):
             return False
-        if self.is_valid_location(col):
-            row = self.get_next_open_row(col)
-            self.board[row][col] = self.turn
-            self.last_move = (row, col)
-            self.check_win()
-            return True
-        return False
+        self._history.append((col, self._turn, self.winner, self.game_over, self.last_move))
+        h = self.bitboard.heights[col]
+        self.hash ^= self.spec.zobrist[self._turn][h]
+        self.mirror_hash ^= self.spec.zobrist[self._turn][self.spec.mirror_bits[h]]
+        row = self.bitboard.drop(col)
+        self._board[row][col] = self._turn
+        if self.evaluator is not None:
+            self.evaluator.add(row * self.spec.cols + col, self._turn)
+        self.last_move = (row, col)
+        self.check_win()
+        return True
+
+    def play(self, col):
+        """إسقاط حجر ثم تمرير الدور، مع حفظ الحركة في المكدس"""
+        if not self.drop_piece(col):
+            return False
+        self.switch_turn()
+        return True
+
+    def undo(self):
+        """التراجع عن آخر حركة واستعادة الدور والفائز وحالة اللعبة كما كانت"""
+        col, turn, winner, game_over, last_move = self._history.pop()
+        self.turn = turn
+        row = self.bitboard.undo(col)
+        h = self.bitboard.heights[col]
+        self.hash ^= self.spec.zobrist[turn][h]
+        self.mirror_hash ^= self.spec.zobrist[turn][self.spec.mirror_bits[h]]
+        self._board[row][col] = 0
+        if self.evaluator is not None:
+            self.evaluator.remove(row * self.spec.cols + col, turn)
+        self.winner = winner
+        self.game_over = game_over
+        self.last_move = last_move
+
+    def is_winning_move(self, col, player=None):
+        """هل يفوز اللاعب (صاحب الدور افتراضياً) بإسقاط حجر في العمود col؟"""
+        if not self.is_valid_location(col):
+            return False
+        opponent = player is not None and player != self._turn
+        return self.bitboard.is_winning_move(col, opponent)
 
     def is_valid_location(self, col):
-        if not (0 <= col < COLS):
+        if not (0 <= col < self.spec.cols):
             return False
-        return self.board[0][col] == 0
+        return self.bitboard.can_play(col)
 
     def get_next_open_row(self, col):
-        for r in reversed(range(ROWS)):
-            if self.board[r][col] == 0:
-                return r
-        return None
+        return self.bitboard.next_row(col)
 
     def check_win(self):
-        # Horizontal, vertical, diagonal checks for current turn
-        for c in range(COLS - 3):
-            for r in range(ROWS):
-                if self.board[r][c] == self.turn and self.board[r][c+1] == self.turn and \
-                   self.board[r][c+2] == self.turn and self.board[r][c+3] == self.turn:
-                    self.winner = self.turn
-                    self.game_over = True
-                    return
-        for c in range(COLS):
-            for r in range(ROWS - 3):
-                if self.board[r][c] == self.turn and self.board[r+1][c] == self.turn and \
-                   self.board[r+2][c] == self.turn and self.board[r+3][c] == self.turn:
-                    self.winner = self.turn
-                    self.game_over = True
-                    return
-        for c in range(COLS - 3):
-            for r in range(ROWS - 3):
-                if self.board[r][c] == self.turn and self.board[r+1][c+1] == self.turn and \
-                   self.board[r+2][c+2] == self.turn and self.board[r+3][c+3] == self.turn:
-                    self.winner = self.turn
-                    self.game_over = True
-                    return
-        for c in range(COLS - 3):
-            for r in range(3, ROWS):
-                if self.board[r][c] == self.turn and self.board[r-1][c+1] == self.turn and \
-                   self.board[r-2][c+2] == self.turn and self.board[r-3][c+3] == self.turn:
-                    self.winner = self.turn
-                    self.game_over = True
-                    return
-        if np.all(self.board != 0):
+        # Only the lines through the last move can complete a win
+        row, col = self.last_move
+        if self.bitboard.connects(self.spec.bit(row, col)):
+            self.winner = self._turn
+            self.game_over = True
+            return
+        if self.bitboard.is_full():
             self.winner = 0  # Draw
             self.game_over = True
 
     def switch_turn(self):
-        self.turn = 1 if self.turn == 2 else 2
+        self.turn = 1 if self._turn == 2 else 2
+
+    def copy(self):
+        """نسخة مستقلة من اللعبة (مع مكدس الحركات)"""
+        other = Connect4Game.__new__(Connect4Game)
+        other.spec = self.spec
+        other._board = self._board.copy()
+        other.bitboard = self.bitboard.copy()
+        other._turn = self._turn
+        other.game_over = self.game_over
+        other.winner = self.winner
+        other.last_move = self.last_move
+        other.hash = self.hash
+        other.mirror_hash = self.mirror_hash
+        other._history = self._history[:]
+        other.evaluator = None if self.evaluator is None else self.evaluator.copy()
+        return other
 
     def reset(self):
-        self.__init__()
+        self.__init__(self.spec)
@@ -6,15 +6,18 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QPixmap, QPainter, QColor, QBrush, QKeyEvent
 from PySide6.QtCore import Qt, QTimer, QRect
 
-from game import Connect4Game, ROWS, COLS
-from levels import AIController
+from game import Connect4Game
+from levels import AIController, PerfectAI
+from ai import MinimaxAlphaBeta
+from ponder import Ponderer
 import random
 import os
 
 class BoardWidget(QWidget):
-    def __init__(self, game, margin=40):
+    def __init__(self, game, margin=40, spec=None):
         super().__init__()
         self.game = game
+        self.spec = game.spec if spec is None else spec
         self.margin = margin
         base = "assets/images/"
 
@@ -57,12 +60,13 @@ class BoardWidget(QWidget):
         avail_w = max(0, self.width() - 2 * self.margin)
         avail_h = max(0, self.height() - 2 * self.margin)
 
-        self.cell_size = min(avail_w // COLS if COLS else 0, avail_h // ROWS if ROWS else 0)
+        rows, cols = self.spec.rows, self.spec.cols
+        self.cell_size = min(avail_w // cols if cols else 0, avail_h // rows if rows else 0)
         if self.cell_size <= 0:
             self.cell_size = 1
 
-        board_w = self.cell_size * COLS
-        board_h = self.cell_size * ROWS
+        board_w = self.cell_size * cols
+        board_h = self.cell_size * rows
 
         x = (self.width() - board_w) // 2
         y = (self.height() - board_h) // 2
@@ -117,8 +121,8 @@ class BoardWidget(QWidget):
         yellow_token = self._get_scaled("yellow", self.yellow_img, token_w, token_h) if self.yellow_img else None
         hl_token = self._get_scaled("hl", self.hl_img, token_w, token_h) if self.hl_img else None
 
-        for r in range(ROWS):
-            for c in range(COLS):
+        for r in range(self.spec.rows):
+            for c in range(self.spec.cols):
                 piece = self.game.board[r][c]
                 x = origin_x + c * self.cell_size
                 y = origin_y + r * self.cell_size
@@ -167,18 +171,20 @@ class BoardWidget(QWidget):
             parent.on_board_click(col)
 
 class GameWindow(QWidget):
-    def __init__(self, mode='pvai', parent_menu=None, difficulty='medium'):
+    def __init__(self, mode='pvai', parent_menu=None, difficulty='medium', spec=None):
         super().__init__()
         self.setWindowTitle(f"Connect 4 - {difficulty.capitalize()} Difficulty")
         self.mode = mode
         self.parent_menu = parent_menu
         self.difficulty = difficulty
 
-        self.game = Connect4Game()
-        self.board_widget = BoardWidget(self.game)
+        self.game = Connect4Game(spec)
+        self.spec = self.game.spec
+        self.board_widget = BoardWidget(self.game, spec=self.spec)
         
         self.ai_player = 2
-        self.ai = AIController.create_ai(difficulty, self.ai_player)
+        self.ai = AIController.create_ai(difficulty, self.ai_player, self.spec)
+        self.ponderer = self._make_ponderer()
 
         self.ai_timer = QTimer(self)
         self.ai_timer.timeout.connect(self.run_ai_turn)
@@ -188,6 +194,19 @@ class GameWindow(QWidget):
 
         if self.mode == "aivai":
             QTimer.singleShot(300, lambda: self.ai_timer.start(500))
+        elif self.ponderer:
+            self.ponderer.start(self.game)
+
+    def _make_ponderer(self):
+        """التفكير أثناء دور اللاعب (ضد محركات Alpha-Beta فقط)
+
+        PerfectAI لا يستخدم البحث العادي بعد بداية اللعبة (الكتاب ثم الحل التام)،
+        فلا تفكير له.
+        """
+        if (self.mode == 'pvai' and isinstance(self.ai, MinimaxAlphaBeta)
+                and not isinstance(self.ai, PerfectAI)):
+            return Ponderer(self.ai)
+        return None
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -284,7 +303,7 @@ class GameWindow(QWidget):
             self.turn_label.setText(f"Current Turn: {player_text}")
 
     def on_board_click(self, col):
-        if not (0 <= col < COLS):
+        if not (0 <= col < self.spec.cols):
             return
         if self.mode == 'pvp' or (self.mode == 'pvai' and self.game.turn != self.ai_player):
             if self.game.drop_piece(col):
@@ -301,9 +320,12 @@ class GameWindow(QWidget):
         """حركة الذكاء الاصطناعي مع تصحيح"""
         if self.game.game_over:
             return
+        # نتيجة التفكير أثناء دور اللاعب تنتقل للمحرك
+        if self.ponderer:
+            self.ponderer.stop()
         
         # طباعة معلومات تصحيح (يمكن إزالتها لاحقاً)
-        valid_moves = [c for c in range(COLS) if self.game.is_valid_location(c)]
+        valid_moves = [c for c in range(self.spec.cols) if self.game.is_valid_location(c)]
         print(f"[DEBUG] {self.difficulty.upper()} AI - الحركات المتاحة: {valid_moves}")
         
         move = self.ai.get_best_move(self.game)
@@ -324,6 +346,8 @@ class GameWindow(QWidget):
         else:
             self.game.switch_turn()
             self.update_turn_indicator()
+            if self.ponderer:
+                self.ponderer.start(self.game)
 
     def run_ai_turn(self):
         if self.game.game_over:
@@ -332,7 +356,7 @@ class GameWindow(QWidget):
         move = self.ai.get_best_move(self.game)
         
         if move is None or not self.game.is_valid_location(move):
-            valid = [c for c in range(COLS) if self.game.is_valid_location(c)]
+            valid = [c for c in range(self.spec.cols) if self.game.is_valid_location(c)]
             if not valid:
                 return
             move = random.choice(valid)
@@ -349,6 +373,8 @@ class GameWindow(QWidget):
     def show_winner(self):
         if self.ai_timer.isActive():
             self.ai_timer.stop()
+        if self.ponderer:
+            self.ponderer.stop()
         
         msg = QMessageBox(self)
         msg.setWindowTitle("🎮 Game Over!")
@@ -402,18 +428,25 @@ class GameWindow(QWidget):
     def restart_game(self):
         if self.ai_timer.isActive():
             self.ai_timer.stop()
+        if self.ponderer:
+            self.ponderer.stop()
         
         self.game.reset()
         self.board_widget.update()
         self.update_turn_indicator()
-        self.ai = AIController.create_ai(self.difficulty, self.ai_player)
+        self.ai = AIController.create_ai(self.difficulty, self.ai_player, self.spec)
+        self.ponderer = self._make_ponderer()
         
         if self.mode == "aivai":
             QTimer.singleShot(200, lambda: self.ai_timer.start(500))
+        elif self.ponderer:
+            self.ponderer.start(self.game)
 
     def back_to_menu(self):
         if self.ai_timer.isActive():
             self.ai_timer.stop()
+        if self.ponderer:
+            self.ponderer.stop()
         self.close()
         if self.parent_menu:
             self.parent_menu.showFullScreen()
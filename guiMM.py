@@ -86,7 +86,7 @@ class MainMenu(QWidget):
         layout.addWidget(difficulty_label)
         
         self.difficulty_combo = QComboBox()
-        self.difficulty_combo.addItems(["Easy", "Medium", "Hard"])
+        self.difficulty_combo.addItems(["Easy", "Medium", "Hard", "Perfect", "MCTS"])
         self.difficulty_combo.setCurrentText("Medium")
         self.difficulty_combo.setFixedHeight(50)
         self.difficulty_combo.setStyleSheet("""
@@ -206,7 +206,9 @@ class MainMenu(QWidget):
         descriptions = {
             "Easy": "🤖 Easy - Shallow search with some randomness",
             "Medium": "⚡ Medium - Balanced performance and speed",
-            "Hard": "🧠 Hard - Advanced search with Alpha-Beta pruning"
+            "Hard": "🧠 Hard - Advanced search with Alpha-Beta pruning",
+            "Perfect": "🎯 Perfect - Solves the position exactly when it can",
+            "MCTS": "🎲 MCTS - Monte Carlo tree search with random playouts"
         }
         self.difficulty_desc.setText(descriptions.get(difficulty, ""))
 
@@ -1,48 +1,68 @@
 # levels.py
-from ai import MinimaxAlphaBeta
-from game import COLS, ROWS, Connect4Game
+from ai import MinimaxAlphaBeta, SearchStats
+from game import HORIZONTAL, DIAGONAL
+from solver import Solver, SolverBudgetExceeded
+from mcts import MCTS
 import random
+import time
 import numpy as np
 
+# PerfectAI يحاول الحل التام عندما تبقى هذه الخانات الفارغة أو أقل (16 حجراً على 6x7):
+# قبلها يتجاوز الحل الميزانية غالباً بعد ثوانٍ من البحث
+SOLVER_MAX_EMPTY = 26
+
 class HardAI(MinimaxAlphaBeta):
     """AI صعب - متوازن ومتنوع الاستراتيجية"""
     
-    def __init__(self, player):
-        super().__init__(player, depth=5, c_param=1.0)
+    def __init__(self, player, spec=None, batch_leaves=False, book=None):
+        super().__init__(player, depth=5, c_param=1.0, spec=spec, batch_leaves=batch_leaves,
+                         book=book)
         self.randomness_factor = 0.03  # 3% فقط عشوائية
         self.last_move = None
         self.consecutive_same_column = 0
-        self.center_column = COLS // 2
+        self.center_column = self.spec.center
         self.center_obsession_counter = 0
         self.defensive_mode = False
         
-    def get_best_move(self, game):
+        # جداول _evaluate_batch: قيمة كل خانة (المركز 5، وباقي الأعمدة (rows - r) * 4)
+        # و neighbours[a, b] = 1 إذا كانت a أول خانة في أحد أشعة b
+        rows, cols = self.spec.rows, self.spec.cols
+        self._batch_cell_values = np.array(
+            [5 if c == self.spec.center else (rows - r) * 4
+             for r in range(rows) for c in range(cols)], dtype=np.int64)
+        self._batch_neighbours = np.zeros((self.spec.size, self.spec.size), dtype=np.int64)
+        for cell, rays in enumerate(self.spec.cell_rays):
+            for ray_pair in rays:
+                for ray in ray_pair:
+                    if ray:
+                        self._batch_neighbours[ray[0], cell] = 1
+        
+    def get_best_move(self, game, time_limit_ms=None, max_depth=None):
         """استراتيجية ذكية مع مرونة كبيرة"""
-        valid_moves = [c for c in range(COLS) if game.is_valid_location(c)]
+        self.last_stats = None
+        valid_moves = [c for c in range(self.spec.cols) if game.is_valid_location(c)]
         if not valid_moves:
             return None
         
+        # نسخة واحدة لكل الفحوصات (play/undo بدون نسخ)
+        position = game.copy()
+        
         # 1. تحقق من الفوز الفوري
         for col in valid_moves:
-            test_game = self._simulate_move(game, col)
-            if test_game.game_over and test_game.winner == self.player:
+            if position.is_winning_move(col, self.player):
                 print(f"[Hard AI] فوز فوري: العمود {col}")
                 self.last_move = col
-                return col
+                return self._unsearched_move(col, "rule")
         
         # 2. تحقق من فوز الخصم الفوري (منعه)
         for col in valid_moves:
-            temp_game = Connect4Game()
-            temp_game.board = game.board.copy()
-            temp_game.turn = self.opponent
-            if temp_game.drop_piece(col):
-                if temp_game.game_over:
-                    print(f"[Hard AI] منع فوز الخصم: العمود {col}")
-                    self.last_move = col
-                    return col
+            if position.is_winning_move(col, self.opponent):
+                print(f"[Hard AI] منع فوز الخصم: العمود {col}")
+                self.last_move = col
+                return self._unsearched_move(col, "rule")
         
         # 3. البحث عن أفضل حركة استباقية
-        strategic_moves = self._find_strategic_moves(game)
+        strategic_moves = self._find_strategic_moves(position)
         if strategic_moves:
             print(f"[Hard AI] حركات استراتيجية متاحة: {strategic_moves}")
         
@@ -54,7 +74,7 @@ class HardAI(MinimaxAlphaBeta):
                 self.consecutive_same_column = 0
         
         # 5. استخدام Minimax الأساسي
-        minimax_move = super().get_best_move(game)
+        minimax_move = super().get_best_move(game, time_limit_ms, max_depth)
         
         # 6. التحقق من إدمان المركز وتصحيحه
         if minimax_move == self.center_column:
@@ -73,8 +93,9 @@ class HardAI(MinimaxAlphaBeta):
                     best_alt_move = alternative_moves[0]
                     
                     for col in alternative_moves:
-                        alt_game = self._simulate_move(game, col)
-                        score = self._evaluate_position(alt_game, col)
+                        position.play(col)
+                        score = self._evaluate_position(position, col)
+                        position.undo()
                         if score > best_alt_score:
                             best_alt_score = score
                             best_alt_move = col
@@ -84,6 +105,11 @@ class HardAI(MinimaxAlphaBeta):
                         print(f"[Hard AI] تغيير استراتيجي: من {self.center_column} إلى {best_alt_move}")
                         self.last_move = best_alt_move
                         self.center_obsession_counter = 0
+                        # إحصاءات البحث تبقى، والحركة من قاعدة تجنب المركز
+                        if self.last_stats is not None:
+                            self.last_stats.move = best_alt_move
+                            self.last_stats.pv = [best_alt_move]
+                            self.last_stats.source = "rule"
                         return best_alt_move
         else:
             self.center_obsession_counter = 0
@@ -101,15 +127,16 @@ class HardAI(MinimaxAlphaBeta):
         """العثور على حركات استراتيجية مهمة"""
         strategic_moves = []
         
-        for col in range(COLS):
+        for col in range(self.spec.cols):
             if not game.is_valid_location(col):
                 continue
             
             # محاكاة الحركة
-            test_game = self._simulate_move(game, col)
+            game.play(col)
             
             # حساب القيمة الاستراتيجية
-            strategic_value = self._calculate_strategic_value(test_game, col)
+            strategic_value = self._calculate_strategic_value(game, col)
+            game.undo()
             
             if strategic_value > 60:  # قيمة استراتيجية عالية
                 strategic_moves.append((strategic_value, col))
@@ -150,33 +177,19 @@ class HardAI(MinimaxAlphaBeta):
     def _evaluate_threat_potential(self, game, col, row):
         """تقييم قدرة الحركة على خلق تهديدات"""
         score = 0
-        directions = [(0, 1), (1, 0), (1, 1), (1, -1)]
+        cells = game.board.ravel().tolist()
         
-        for dr, dc in directions:
+        # الأشعة المحسوبة مسبقاً في الاتجاهات (0,1) (1,0) (1,1) (1,-1)
+        for forward, backward in self.spec.cell_rays[row * self.spec.cols + col]:
             # تحقق في كلا الاتجاهين
             count = 1
             
-            # اتجاه إيجابي
-            for i in range(1, 4):
-                nr, nc = row + dr * i, col + dc * i
-                if 0 <= nr < ROWS and 0 <= nc < COLS:
-                    if game.board[nr][nc] == self.player:
+            for ray in (forward, backward):
+                for i in ray:
+                    if cells[i] == self.player:
                         count += 1
-                    elif game.board[nr][nc] != 0:
+                    elif cells[i] != 0:
                         break
-                else:
-                    break
-            
-            # اتجاه سلبي
-            for i in range(1, 4):
-                nr, nc = row - dr * i, col - dc * i
-                if 0 <= nr < ROWS and 0 <= nc < COLS:
-                    if game.board[nr][nc] == self.player:
-                        count += 1
-                    elif game.board[nr][nc] != 0:
-                        break
-                else:
-                    break
             
             # تقييم التهديد
             if count >= 3:
@@ -194,15 +207,15 @@ class HardAI(MinimaxAlphaBeta):
             return 0
         
         # محاكاة ما يمكن أن يفعله الخصم بعد حركتنا
-        our_move_game = self._simulate_move(game, col)
+        game.play(col)
         
         # تحقق من تهديدات الخصم في الجولة التالية
         opponent_threats = 0
-        for opp_col in range(COLS):
-            if our_move_game.is_valid_location(opp_col):
-                opp_game = self._simulate_move(our_move_game, opp_col)
-                if opp_game.game_over and opp_game.winner == self.opponent:
+        if game.turn == self.opponent:
+            for opp_col in range(self.spec.cols):
+                if game.is_winning_move(opp_col):
                     opponent_threats += 100  # تهديد فوز خطير
+        game.undo()
         
         # القيمة الدفاعية هي عكس تهديدات الخصم
         return -opponent_threats
@@ -212,7 +225,7 @@ class HardAI(MinimaxAlphaBeta):
         score = 0
         
         # تفضيل المواقع المركزية لكن ليس بشكل مفرط
-        center = COLS // 2
+        center = self.spec.center
         distance_from_center = abs(col - center)
         
         # قيمة الموقع تنخفض كلما ابتعدنا عن المركز
@@ -220,7 +233,7 @@ class HardAI(MinimaxAlphaBeta):
         score += positional_value
         
         # تفضيل الصفوف السفلية (أكثر استقراراً)
-        row_value = (ROWS - row) * 3
+        row_value = (self.spec.rows - row) * 3
         score += row_value
         
         return score
@@ -236,9 +249,9 @@ class HardAI(MinimaxAlphaBeta):
         score -= self._evaluate_threats(game, self.opponent) * 8
         
         # 3. نقاط لتوزيع القطع
-        pieces_per_column = [0] * COLS
-        for r in range(ROWS):
-            for c in range(COLS):
+        pieces_per_column = [0] * self.spec.cols
+        for r in range(self.spec.rows):
+            for c in range(self.spec.cols):
                 if game.board[r][c] == self.player:
                     pieces_per_column[c] += 1
         
@@ -274,11 +287,13 @@ class HardAI(MinimaxAlphaBeta):
             score = self._basic_evaluation(game)
         
         # **تخفيض كبير لوزن المركز**
-        center = COLS // 2
+        rows, cols = self.spec.rows, self.spec.cols
+        center = self.spec.center
         center_pieces = 0
+        cells = game.board.ravel().tolist()
         
-        for r in range(ROWS):
-            if game.board[r][center] == self.player:
+        for r in range(rows):
+            if cells[r * cols + center] == self.player:
                 center_pieces += 1
         
         # وزن خفيف جداً للمركز (مش أكثر من 20 نقطة)
@@ -286,26 +301,25 @@ class HardAI(MinimaxAlphaBeta):
         
         # **مكافأة كبيرة للأعمدة الأخرى**
         non_center_score = 0
-        for c in range(COLS):
+        for c in range(cols):
             if c == center:
                 continue
             
             column_score = 0
-            for r in range(ROWS):
-                if game.board[r][c] == self.player:
+            for r in range(rows):
+                if cells[r * cols + c] == self.player:
                     # وزن أكبر للأعمدة غير المركزية
-                    column_score += (ROWS - r) * 4
+                    column_score += (rows - r) * 4
             
             non_center_score += column_score
         
         score += non_center_score
         
         # **عقوبة التركيز في عمود واحد**
-        column_distribution = [0] * COLS
-        for r in range(ROWS):
-            for c in range(COLS):
-                if game.board[r][c] == self.player:
-                    column_distribution[c] += 1
+        column_distribution = [0] * cols
+        for i, piece in enumerate(cells):
+            if piece == self.player:
+                column_distribution[i % cols] += 1
         
         total_pieces = sum(column_distribution)
         if total_pieces > 3:  # فقط إذا كان لدينا عدة قطع
@@ -326,11 +340,43 @@ class HardAI(MinimaxAlphaBeta):
         
         return score
     
+    def _evaluate_batch(self, boards):
+        """نفس _evaluate_board لمصفوفة لوحات (N, rows, cols) دفعة واحدة"""
+        scores = super()._evaluate_batch(boards)
+        spec = self.spec
+        rows, cols = spec.rows, spec.cols
+        boards = np.asarray(boards)
+        n = len(boards)
+        
+        mine = boards.reshape(n, -1) == self.player
+        extra = mine.astype(np.int64) @ self._batch_cell_values
+        
+        # عقوبة التركيز التصاعدية
+        per_column = mine.reshape(n, rows, cols).sum(axis=1)
+        total = per_column.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            concentration = per_column.max(axis=1) / total
+        many = total > 3
+        extra -= np.select([many & (concentration > 0.7), many & (concentration > 0.6),
+                            many & (concentration > 0.5)], [150, 80, 40], 0)
+        
+        # تنوع التهديدات: أعمدة خانتها التالية تجاور حجراً لنا في أي اتجاه
+        heights = (boards != 0).sum(axis=1)
+        open_cells = np.clip(rows - 1 - heights, 0, None) * cols + np.arange(cols)
+        own_neighbours = mine.astype(np.int64) @ self._batch_neighbours
+        threats = (heights < rows) & (np.take_along_axis(own_neighbours, open_cells, axis=1) > 0)
+        extra += threats.sum(axis=1) * 25
+        
+        indices = self.batch_evaluator.window_indices(boards)
+        over, _ = self.batch_evaluator.terminal(indices, boards, self.player)
+        return np.where(over, scores, scores + extra)
+    
     def _calculate_threat_diversity(self, game):
         """حساب تنوع التهديدات عبر اللوحة"""
         threat_columns = set()
+        cells = game.board.ravel().tolist()
         
-        for col in range(COLS):
+        for col in range(self.spec.cols):
             if not game.is_valid_location(col):
                 continue
             
@@ -339,28 +385,15 @@ class HardAI(MinimaxAlphaBeta):
                 continue
             
             # تحقق في الاتجاهات الأربعة
-            directions = [(0, 1), (1, 0), (1, 1), (1, -1)]
-            
-            for dr, dc in directions:
+            for forward, backward in self.spec.cell_rays[row * self.spec.cols + col]:
                 count = 1
                 
-                # اتجاه إيجابي
-                r, c = row, col
-                for i in range(1, 4):
-                    nr, nc = r + dr * i, c + dc * i
-                    if 0 <= nr < ROWS and 0 <= nc < COLS and game.board[nr][nc] == self.player:
-                        count += 1
-                    else:
-                        break
-                
-                # اتجاه سلبي
-                r, c = row, col
-                for i in range(1, 4):
-                    nr, nc = r - dr * i, c - dc * i
-                    if 0 <= nr < ROWS and 0 <= nc < COLS and game.board[nr][nc] == self.player:
-                        count += 1
-                    else:
-                        break
+                for ray in (forward, backward):
+                    for i in ray:
+                        if cells[i] == self.player:
+                            count += 1
+                        else:
+                            break
                 
                 if count >= 2:  # إذا كان هناك تهديد محتمل
                     threat_columns.add(col)
@@ -371,26 +404,24 @@ class HardAI(MinimaxAlphaBeta):
     def _basic_evaluation(self, game):
         """تقييم أساسي"""
         score = 0
-        
-        # تقييم التهديدات
-        for r in range(ROWS):
-            for c in range(COLS - 3):
-                window = game.board[r, c:c+4]
-                score += self._evaluate_window(window, self.player) * 8
-                score -= self._evaluate_window(window, self.opponent) * 8
-        
-        # تقييم القطر
-        for r in range(ROWS - 3):
-            for c in range(COLS - 3):
-                window = [game.board[r][c], game.board[r+1][c+1],
-                         game.board[r+2][c+2], game.board[r+3][c+3]]
-                score += self._evaluate_window(window, self.player) * 10
-                score -= self._evaluate_window(window, self.opponent) * 10
+        cells = game.board.ravel().tolist()
+        
+        # تقييم التهديدات (أفقي بوزن 8) والقطر (بوزن 10)
+        for line, direction in zip(self.spec.win_lines, self.spec.line_directions):
+            if direction == HORIZONTAL:
+                weight = 8
+            elif direction == DIAGONAL:
+                weight = 10
+            else:
+                continue
+            window = [cells[i] for i in line]
+            score += self._evaluate_window(window, self.player) * weight
+            score -= self._evaluate_window(window, self.opponent) * weight
         
         # وزن خفيف للمركز
-        center = COLS // 2
-        for r in range(ROWS):
-            if game.board[r][center] == self.player:
+        center = self.spec.center
+        for r in range(self.spec.rows):
+            if cells[r * self.spec.cols + center] == self.player:
                 score += 3
         
         return score
@@ -398,51 +429,109 @@ class HardAI(MinimaxAlphaBeta):
 class EasyAI(MinimaxAlphaBeta):
     """AI سهل"""
     
-    def __init__(self, player):
-        super().__init__(player, depth=2, c_param=1.0)
+    def __init__(self, player, spec=None, book=None):
+        super().__init__(player, depth=2, c_param=1.0, spec=spec, book=book)
         self.randomness_factor = 0.4
     
-    def get_best_move(self, game):
-        valid_moves = [c for c in range(COLS) if game.is_valid_location(c)]
+    def get_best_move(self, game, time_limit_ms=None, max_depth=None):
+        self.last_stats = None
+        valid_moves = [c for c in range(self.spec.cols) if game.is_valid_location(c)]
         if not valid_moves:
             return None
         
         # 50% عشوائية
         if random.random() < self.randomness_factor:
-            return random.choice(valid_moves)
+            return self._unsearched_move(random.choice(valid_moves), "random")
         
-        return super().get_best_move(game)
+        return super().get_best_move(game, time_limit_ms, max_depth)
 
 class MediumAI(MinimaxAlphaBeta):
     """AI متوسط"""
     
-    def __init__(self, player):
-        super().__init__(player, depth=4, c_param=1.0)
+    def __init__(self, player, spec=None, book=None):
+        super().__init__(player, depth=4, c_param=1.0, spec=spec, book=book)
         self.randomness_factor = 0.1
     
-    def get_best_move(self, game):
-        valid_moves = [c for c in range(COLS) if game.is_valid_location(c)]
+    def get_best_move(self, game, time_limit_ms=None, max_depth=None):
+        self.last_stats = None
+        valid_moves = [c for c in range(self.spec.cols) if game.is_valid_location(c)]
         if not valid_moves:
             return None
         
         # 10% عشوائية فقط
         if random.random() < self.randomness_factor:
-            return random.choice(valid_moves)
+            return self._unsearched_move(random.choice(valid_moves), "random")
         
-        return super().get_best_move(game)
+        return super().get_best_move(game, time_limit_ms, max_depth)
+
+class PerfectAI(MinimaxAlphaBeta):
+    """AI مثالي - الكتاب، ثم الحل التام عندما يصبح ممكناً، وإلا البحث العادي
+
+    الحل يبدأ عندما تبقى solver_max_empty خانة فارغة أو أقل، ويرجع للبحث
+    العادي إذا تجاوز node_budget.
+    """
+    
+    def __init__(self, player, spec=None, node_budget=200000, tt_size_mb=16, book=None,
+                 solver_max_empty=SOLVER_MAX_EMPTY):
+        super().__init__(player, depth=8, c_param=1.0, spec=spec, tt_size_mb=tt_size_mb,
+                         book=book)
+        self.solver = Solver(self.spec, tt_size_mb)
+        self.node_budget = node_budget
+        self.solver_max_empty = solver_max_empty
+        self.last_scores = None
+    
+    def get_best_move(self, game, time_limit_ms=None, max_depth=None):
+        if game.game_over or game.turn != self.player or game.spec != self.spec:
+            return super().get_best_move(game, time_limit_ms, max_depth)
+        self.last_stats = None
+        if self.book is not None:
+            move = self.book.best_move(game)
+            if move is not None:
+                # نتائج التفكير تقرأ في البحث العادي فقط، فتحذف هنا قبل أن تقدم
+                self.ponder_results = {}
+                return self._unsearched_move(move, "book")
+        
+        self.last_scores = None
+        if self.spec.size - game.bitboard.moves > self.solver_max_empty:
+            # بداية اللعبة: الحل لن ينتهي ضمن الميزانية
+            return super().get_best_move(game, time_limit_ms, max_depth)
+        start = time.monotonic()
+        try:
+            scores = self.solver.analyze(game, self.node_budget)
+        except SolverBudgetExceeded:
+            # الموقع أكبر من الميزانية: بحث Minimax بعمق ثابت
+            return super().get_best_move(game, time_limit_ms, max_depth)
+        elapsed = time.monotonic() - start
+        
+        self.ponder_results = {}
+        self.last_scores = scores
+        if not scores:
+            return None
+        best_score = max(scores.values())
+        move = self.rng.choice([col for col, score in scores.items() if score == best_score])
+        if self.collect_stats:
+            nodes = self.solver.nodes
+            self.last_stats = SearchStats(move=move, score=best_score, nodes=nodes, time=elapsed,
+                                          nps=nodes / elapsed if elapsed else 0.0,
+                                          pv=[move], source="solver")
+        return move
 
 class AIController:
     """وحدة التحكم في AI"""
     
     @staticmethod
-    def create_ai(difficulty, player):
+    def create_ai(difficulty, player, spec=None, book=None):
         difficulty = difficulty.lower()
         
         if difficulty == "easy":
-            return EasyAI(player)
+            return EasyAI(player, spec, book=book)
         elif difficulty == "medium":
-            return MediumAI(player)
+            return MediumAI(player, spec, book=book)
         elif difficulty == "hard":
-            return HardAI(player)
+            return HardAI(player, spec, book=book)
+        elif difficulty == "perfect":
+            return PerfectAI(player, spec, book=book)
+        elif difficulty == "mcts":
+            return MCTS(player, c_param=1.41, spec=spec)
         else:
-            return MediumAI(player)
\ No newline at end of file
+            return MediumAI(player, spec, book=book)
\ No newline at end of file
@@ -0,0 +1,228 @@
+# mcts.py
+import math
+import random
+import time
+
+import numpy as np
+
+from ai import SearchStats
+from batch import bitboard_rollouts
+from game import DEFAULT_SPEC, winning_positions
+
+# عدد المحاكاة الافتراضي عندما لا يحدد وقت
+DEFAULT_PLAYOUTS = 5000
+
+
+class Node:
+    """عقدة في شجرة البحث: القيم من منظور اللاعب الذي لعب الحركة المؤدية إليها"""
+
+    __slots__ = ("move", "key", "parent", "children", "untried", "visits", "wins", "terminal")
+
+    def __init__(self, move, key, parent, untried, terminal=None):
+        self.move = move
+        self.key = key
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        # نتيجة ثابتة للعقد المنتهية (1 فوز لمن لعب الحركة، 0.5 تعادل)
+        self.terminal = terminal
+
+
+class MCTS:
+    """بحث شجرة مونت كارلو (UCT) على البت بورد
+
+    - الاختيار بـ UCB1 مع ثابت الاستكشاف c_param
+    - التوسيع بحركة واحدة جديدة في كل محاكاة
+    - محاكاة عشوائية سريعة على أعداد خام، مع أخذ الفوز الفوري ومنع فوز الخصم
+    - الشجرة تحفظ بين الحركات، ويعاد استخدام الفرع الذي وصلت إليه اللعبة
+
+    مع rollout_batch > 1 تستبدل المحاكاة الواحدة بـ rollout_batch لعبة عشوائية
+    بعمليات NumPy (batch.bitboard_rollouts)، وتضاف كلها لإحصاءات الورقة.
+    """
+
+    def __init__(self, player, c_param=1.41, spec=None, playouts=DEFAULT_PLAYOUTS, seed=None,
+                 rollout_batch=1):
+        self.spec = DEFAULT_SPEC if spec is None else spec
+        self.player = player
+        self.opponent = 1 if player == 2 else 2
+        self.c_param = c_param
+        self.playouts = playouts
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.rollout_batch = rollout_batch
+        self.np_rng = np.random.default_rng(seed)
+        self.root = None
+        center = self.spec.center
+        self.column_order = sorted(range(self.spec.cols), key=lambda c: abs(c - center))
+        self.column_masks = [((1 << self.spec.rows) - 1) << (c * self.spec.h1)
+                             for c in range(self.spec.cols)]
+        # إحصاءات آخر بحث
+        self.playouts_done = 0
+        self.elapsed = 0.0
+        self.reused_visits = 0
+        # SearchStats لآخر حركة (المحاكاة بدل العقد، والقيمة نسبة فوز الحركة)
+        self.last_stats = None
+
+    def playouts_per_second(self):
+        return self.playouts_done / self.elapsed if self.elapsed else 0.0
+
+    def get_best_move(self, game, time_limit_ms=None, max_playouts=None):
+        """أفضل حركة (الأكثر زيارة) بعد max_playouts محاكاة أو انتهاء time_limit_ms
+
+        بدون أي حد يستخدم عدد المحاكاة الافتراضي للمحرك.
+        """
+        self.playouts_done = 0
+        self.elapsed = 0.0
+        self.last_stats = None
+        if game.turn != self.player or game.game_over:
+            return None
+        if game.spec != self.spec:
+            raise ValueError(f"game uses {game.spec}, engine was built for {self.spec}")
+        if max_playouts is None and time_limit_ms is None:
+            max_playouts = self.playouts
+
+        board = game.bitboard
+        root = self._reuse_root(board.key())
+        if root is None:
+            root = Node(None, board.key(), None, self._legal_columns(board.mask))
+        self.root = root
+        self.reused_visits = root.visits
+
+        # فوز فوري: لا حاجة للبحث
+        possible = (board.mask + self.spec.bottom_mask) & self.spec.board_mask
+        wins = winning_positions(board.current, board.mask, self.spec) & possible
+        if wins:
+            move = next(c for c in self.column_order if wins & self.column_masks[c])
+            self.last_stats = SearchStats(move=move, pv=[move], source="rule")
+            return move
+
+        start = time.monotonic()
+        deadline = None if time_limit_ms is None else start + time_limit_ms / 1000
+        root_state = (board.current, board.mask, board.moves)
+        while max_playouts is None or self.playouts_done < max_playouts:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            self.playouts_done += self._simulate(root, *root_state)
+        self.elapsed = time.monotonic() - start
+
+        if not root.children:
+            # لم تكتمل أي محاكاة: أول عمود ممكن من المركز
+            if not root.untried:
+                return None
+            move = root.untried[0]
+            self.last_stats = SearchStats(move=move, time=self.elapsed, pv=[move], source="rule")
+            return move
+        best = max(root.children, key=lambda child: child.visits)
+        self.last_stats = SearchStats(move=best.move, score=best.wins / best.visits,
+                                      nodes=self.playouts_done, time=self.elapsed,
+                                      nps=self.playouts_per_second(), pv=[best.move],
+                                      source="mcts")
+        return best.move
+
+    def _reuse_root(self, key):
+        """عقدة الموقع الحالي من شجرة البحث السابق (حتى حركتين للأسفل)، أو None"""
+        root = self.root
+        if root is None:
+            return None
+        for node in [root] + root.children:
+            if node.key == key:
+                node.parent = None
+                return node
+            for child in node.children:
+                if child.key == key:
+                    child.parent = None
+                    return child
+        return None
+
+    def _legal_columns(self, mask):
+        """الأعمدة غير الممتلئة (الخانة العليا فارغة)، من المركز للأطراف"""
+        top = self.spec.rows - 1
+        return [c for c in self.column_order if not mask >> (c * self.spec.h1 + top) & 1]
+
+    def _simulate(self, node, current, mask, moves):
+        """محاكاة واحدة: اختيار، توسيع، تشغيل عشوائي، ثم نشر النتيجة للأعلى
+
+        يعيد عدد الألعاب العشوائية التي أضيفت للشجرة.
+        """
+        spec = self.spec
+        log = math.log
+        sqrt = math.sqrt
+        c_param = self.c_param
+
+        # 1. الاختيار: UCB1 حتى عقدة فيها حركات غير مجربة أو عقدة منتهية
+        while node.terminal is None and not node.untried and node.children:
+            log_visits = log(node.visits)
+            best = None
+            best_value = -1.0
+            for child in node.children:
+                value = child.wins / child.visits + c_param * sqrt(log_visits / child.visits)
+                if value > best_value:
+                    best, best_value = child, value
+            node = best
+            move = (mask + spec.bottom_mask) & self.column_masks[node.move]
+            current, mask = current ^ mask, mask | move
+            moves += 1
+
+        # 2. التوسيع
+        if node.terminal is None and node.untried:
+            col = node.untried.pop(self.rng.randrange(len(node.untried)))
+            move = (mask + spec.bottom_mask) & self.column_masks[col]
+            terminal = None
+            if winning_positions(current, mask, spec) & move:
+                terminal = 1.0
+            elif moves + 1 == spec.size:
+                terminal = 0.5
+            current, mask = current ^ mask, mask | move
+            moves += 1
+            child = Node(col, current + mask, node, [] if terminal is not None
+                         else self._legal_columns(mask), terminal)
+            node.children.append(child)
+            node = child
+
+        # 3. المحاكاة: مجموع النتائج لمن لعب الحركة المؤدية إلى node
+        count = 1
+        if node.terminal is not None:
+            result = node.terminal
+        elif self.rollout_batch > 1:
+            count = self.rollout_batch
+            result = count - self._batch_playout(current, mask, moves, count)
+        else:
+            result = 1.0 - self._playout(current, mask, moves)
+
+        # 4. النشر
+        while node is not None:
+            node.visits += count
+            node.wins += result
+            result = count - result
+            node = node.parent
+        return count
+
+    def _playout(self, current, mask, moves):
+        """لعب عشوائي حتى النهاية: 1 إذا فاز صاحب الدور، 0 إذا خسر، 0.5 تعادل"""
+        spec = self.spec
+        bottom = spec.bottom_mask
+        board_mask = spec.board_mask
+        size = spec.size
+        column_masks = self.column_masks
+        choice = self.rng.choice
+        result = 1.0
+        while moves < size:
+            possible = (mask + bottom) & board_mask
+            if winning_positions(current, mask, spec) & possible:
+                return result
+            block = winning_positions(current ^ mask, mask, spec) & possible
+            if block:
+                move = block & -block
+            else:
+                move = choice([possible & c for c in column_masks if possible & c])
+            current, mask = current ^ mask, mask | move
+            moves += 1
+            result = 1.0 - result
+        return 0.5
+
+    def _batch_playout(self, current, mask, moves, count):
+        """count لعبة عشوائية دفعة واحدة: مجموع النتائج لصاحب الدور (التعادل نصف)"""
+        result = bitboard_rollouts(current, mask, moves, count, self.spec, self.np_rng)
+        return float((result == 1).sum()) + 0.5 * float((result == 0).sum())
@@ -0,0 +1,211 @@
+# parallel.py
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from ai import SearchTimeout
+from transposition import SharedTranspositionTable, TranspositionTable
+
+# العمليات المساعدة تفحص علامة الإيقاف أكثر من فحص الوقت العادي
+HELPER_CHECK_INTERVAL = 128
+
+# حالة كل عملية عاملة (تضبط مرة واحدة عند إنشائها)
+_worker_engine = None
+_shared_alpha = None
+
+
+def _init_worker(engine, shared_alpha):
+    global _worker_engine, _shared_alpha
+    engine.workers = 1
+    _worker_engine = engine
+    _shared_alpha = shared_alpha
+
+
+def _search_root_move(position, col, depth, player, deadline, fresh):
+    """بحث حركة جذر واحدة في العملية العاملة: (العمود، القيمة أو None عند انتهاء الوقت، العدادات)
+
+    العدادات: (العقد، القطع، القطع بأول حركة، التقييمات، استعلامات الجدول، نجاحاتها).
+
+    fresh يبدأ بجدول تبديل وجداول ترتيب فارغة، فلا تعتمد النتيجة على
+    الحركات التي بحثتها هذه العملية قبلها.
+    """
+    engine = _worker_engine
+    engine.player = player
+    engine.opponent = 1 if player == 2 else 2
+    if fresh:
+        if engine.tt is not None:
+            engine.tt.clear()
+        for table in engine.history:
+            table[:] = [0] * len(table)
+        for killers in engine.killers:
+            killers[0] = killers[1] = None
+    engine.nodes_evaluated = 0
+    engine.cutoffs = 0
+    engine.first_move_cutoffs = 0
+    engine.eval_calls = 0
+    tt_probes, tt_hits = (engine.tt.probes, engine.tt.hits) if engine.tt is not None else (0, 0)
+    engine._deadline = deadline
+    engine._next_check = engine.check_interval
+
+    # النافذة تبدأ تحت أفضل قيمة معروفة بنقطة: ما يساويها أو يتجاوزها قيمة دقيقة
+    alpha = _shared_alpha.value
+    position.play(col)
+    try:
+        score = engine._search_child(position, depth, alpha - 1)
+    except SearchTimeout:
+        score = None
+    finally:
+        engine._deadline = None
+    if engine.tt is not None:
+        tt_probes, tt_hits = engine.tt.probes - tt_probes, engine.tt.hits - tt_hits
+    counters = (engine.nodes_evaluated, engine.cutoffs, engine.first_move_cutoffs,
+                engine.eval_calls, tt_probes, tt_hits)
+    if score is None:
+        return col, None, counters
+
+    with _shared_alpha.get_lock():
+        if score > _shared_alpha.value:
+            _shared_alpha.value = score
+    return col, score, counters
+
+
+class RootParallelSearch:
+    """توزيع حركات الجذر على عمليات عاملة دائمة مع alpha مشتركة
+
+    كل عملية تحمل نسخة من المحرك (بجدول تبديل خاص بها). أفضل قيمة جذر
+    معروفة تحفظ في multiprocessing.Value فتستفيد منها الحركات اللاحقة للقطع.
+    كل حركة تبحث بنافذة (alpha - 1, +inf)، فقيم الحركات التي تساوي الأفضل
+    أو تتجاوزه دقيقة والنتيجة لا تعتمد على ترتيب انتهاء العمليات.
+    """
+
+    def __init__(self, engine, workers):
+        self.engine = engine
+        self.workers = workers
+        self.deterministic = engine.seed is not None
+        self.shared_alpha = multiprocessing.Value('d', -float('inf'))
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                        initargs=(engine, self.shared_alpha))
+
+    def search(self, position, depth, moves, deadline=None):
+        """تكرار واحد بعمق ثابت: (أفضل الحركات المتعادلة، أفضل قيمة)
+
+        عدادات العمليات العاملة (العقد، القطع، التقييمات، الجدول) تضاف إلى عدادات
+        المحرك، وانتهاء الوقت في أي حركة يرفع SearchTimeout كما في البحث المتسلسل.
+        """
+        self.shared_alpha.value = -float('inf')
+        futures = [self.pool.submit(_search_root_move, position, col, depth,
+                                    self.engine.player, deadline, self.deterministic)
+                   for col in moves]
+
+        scores = {}
+        timed_out = False
+        engine = self.engine
+        for future in futures:
+            col, score, counters = future.result()
+            nodes, cutoffs, first_move_cutoffs, eval_calls, tt_probes, tt_hits = counters
+            engine.nodes_evaluated += nodes
+            engine.cutoffs += cutoffs
+            engine.first_move_cutoffs += first_move_cutoffs
+            engine.eval_calls += eval_calls
+            engine.worker_tt_probes += tt_probes
+            engine.worker_tt_hits += tt_hits
+            if score is None:
+                timed_out = True
+            scores[col] = score
+        if timed_out:
+            raise SearchTimeout()
+
+        best_score = max(scores.values())
+        best_moves = [col for col in moves if scores[col] == best_score]
+        return best_moves, best_score
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _init_helper(engine, table, stop):
+    global _worker_engine
+    engine.workers = 1
+    engine.tt = table
+    engine._stop = stop
+    engine.check_interval = HELPER_CHECK_INTERVAL
+    _worker_engine = engine
+
+
+def _helper_search(position, max_depth, player, deadline, index):
+    """تعميق تكراري في عملية مساعدة حتى الإيقاف، ويعيد عدد العقد
+
+    العمليات الفردية تبدأ بعمق أكبر بواحد، وكل عملية تدير ترتيب حركات
+    الجذر بمقدار مختلف، فتملأ الجدول المشترك بفروع لم يصلها البحث الرئيسي بعد.
+    """
+    engine = _worker_engine
+    engine.player = player
+    engine.opponent = 1 if player == 2 else 2
+    # المحرك يبقى بين الحركات: عدادات وقيم الجذر (نوافذ NegamaxPVS) من الموقع السابق تصفر
+    engine._reset_search()
+    engine._deadline = float('inf') if deadline is None else deadline
+    engine._next_check = engine.check_interval
+
+    moves = engine._order_moves(position, 0)
+    shift = index % len(moves)
+    moves = moves[shift:] + moves[:shift]
+    try:
+        for depth in range(1 + index % 2, max_depth + 1):
+            engine._search_root(position, depth, moves)
+    except SearchTimeout:
+        pass
+    finally:
+        engine._deadline = None
+    return engine.nodes_evaluated
+
+
+class LazySMPSearch:
+    """Lazy SMP: عمليات مساعدة تبحث نفس الموقع مع البحث الرئيسي
+
+    كل العمليات (والبحث الرئيسي) تقرأ وتكتب جدول تبديل واحداً في ذاكرة
+    مشتركة، فيستفيد البحث الرئيسي من نتائج المساعدين بدون أي تنسيق آخر.
+    """
+
+    def __init__(self, engine, workers):
+        self.engine = engine
+        self.helpers = workers - 1
+        self.table = SharedTranspositionTable(engine.tt_size_mb or 16)
+        engine.tt = self.table
+        self.stop_flag = multiprocessing.Value('b', 0, lock=False)
+        self.pool = ProcessPoolExecutor(max_workers=self.helpers, initializer=_init_helper,
+                                        initargs=(engine, self.table, self.stop_flag))
+        self.futures = []
+
+    def start(self, position, max_depth, deadline=None):
+        self.stop_flag.value = 0
+        # الموقع يسلسل لاحقاً في خيط المنفذ، والبحث الرئيسي يعدل position أثناءها
+        snapshot = position.copy()
+        self.futures = [self.pool.submit(_helper_search, snapshot, max_depth,
+                                         self.engine.player, deadline, index)
+                        for index in range(1, self.helpers + 1)]
+
+    def stop(self):
+        """إيقاف المساعدين وانتظارهم كلهم، ويعيد مجموع عقدهم
+
+        خطأ أي مساعد يرفع بعد انتظار الباقين.
+        """
+        self.stop_flag.value = 1
+        nodes = 0
+        error = None
+        for future in self.futures:
+            try:
+                nodes += future.result()
+            except Exception as exc:
+                error = error or exc
+        self.futures = []
+        if error is not None:
+            raise error
+        return nodes
+
+    def close(self):
+        try:
+            self.stop()
+        finally:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            engine = self.engine
+            engine.tt = TranspositionTable(engine.tt_size_mb) if engine.tt_size_mb else None
+            self.table.close()
@@ -0,0 +1,72 @@
+# ponder.py
+import ctypes
+import threading
+
+
+class Ponderer:
+    """التفكير أثناء دور الخصم في خيط خلفي
+
+    يبحث المحرك بعد كل رد محتمل للخصم (بترتيب الحركات المعتاد) بنفس عمق
+    اللعب، فيمتلئ جدول التبديل وتحفظ أفضل الحركات المتعادلة لكل رد. stop()
+    توقف الخيط وتنقل النتائج إلى engine.ponder_results، فيختار get_best_move
+    من نتيجة الرد الذي لعب فعلاً مباشرة ويحذف الباقي. النتائج بمفتاح جدول
+    التبديل (engine._tt_keys)، فالردان المتناظران يبحثان مرة واحدة.
+    البحث بـ engine._ponder_search: ترتيب الحركات وself.rng وإحصاءات آخر
+    حركة لا تتأثر.
+    """
+
+    def __init__(self, engine, max_replies=None):
+        self.engine = engine
+        # None = كل الردود الممكنة
+        self.max_replies = max_replies
+        self.results = {}
+        self._thread = None
+        self._stop = ctypes.c_bool(False)
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, game):
+        """بدء التفكير في الموقع game (الدور للخصم)"""
+        self.stop()
+        engine = self.engine
+        if game.game_over or game.turn == engine.player:
+            return
+        # العمليات العاملة للبحث المتوازي في الجذر لا ترى علامة الإيقاف
+        if engine.workers > 1 and engine.parallel == "root":
+            return
+        self.results = {}
+        self._stop.value = False
+        engine._stop = self._stop
+        self._thread = threading.Thread(target=self._run, args=(game.copy(),), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """إيقاف الخيط وانتظاره، ثم تسليم النتائج للمحرك"""
+        if self._thread is None:
+            return
+        self._stop.value = True
+        self._thread.join()
+        self._thread = None
+        self.engine._stop = None
+        self.engine.ponder_results = self.results
+        self.results = {}
+
+    def _run(self, position):
+        engine = self.engine
+        replies = engine._order_moves(position, 0)
+        if self.max_replies is not None:
+            replies = replies[:self.max_replies]
+        for col in replies:
+            if self._stop.value:
+                break
+            position.play(col)
+            _, key, mirrored = engine._tt_keys(position)
+            if not position.game_over and key not in self.results:
+                moves, depth = engine._ponder_search(position)
+                if moves:
+                    if mirrored:
+                        moves = [engine.spec.mirror_move(move) for move in moves]
+                    self.results[key] = (moves, depth)
+            position.undo()
@@ -0,0 +1,170 @@
+# solver.py
+from game import DEFAULT_SPEC, winning_positions
+
+
+class SolverBudgetExceeded(Exception):
+    """تجاوز الحل عدد العقد المسموح به"""
+
+
+class Solver:
+    """حل تام للموقع بطريقة Pascal Pons: negamax بنافذة صفرية وحدود النتيجة
+
+    القيمة من منظور صاحب الدور: موجبة إذا فاز مهما لعب الخصم، وتساوي عدد
+    الأحجار التي تبقى معه عند الفوز الأسرع (الفوز الأقرب قيمته أكبر)،
+    وسالبة للخسارة بنفس المعنى، وصفر للتعادل.
+
+    - الحركات التي تعطي الخصم فوزاً فورياً تستبعد قبل البحث
+    - حد أعلى وأدنى للقيمة من عدد الحركات الباقية
+    - جدول تبديل بحد أعلى لكل موقع، وترتيب الحركات من المركز وحسب التهديدات التي تصنعها
+    """
+
+    def __init__(self, spec=DEFAULT_SPEC, tt_size_mb=16):
+        self.spec = spec
+        # dict بحد أقصى للمدخلات (تقدير ~100 بايت للمدخل)، يفرغ عند الامتلاء
+        self.max_entries = max(1, int(tt_size_mb * 1024 * 1024) // 100)
+        self.table = {}
+        self.nodes = 0
+        self.node_budget = None
+        h1 = spec.h1
+        center = spec.center
+        order = sorted(range(spec.cols), key=lambda c: (abs(c - center), c))
+        self.column_masks = [((1 << spec.rows) - 1) << (c * h1) for c in order]
+        self.column_order = order
+
+    def reset(self):
+        self.table.clear()
+
+    def _negamax(self, position, mask, moves, alpha, beta):
+        """negamax لموقع لا يستطيع صاحب الدور فيه الفوز بالحركة التالية"""
+        self.nodes += 1
+        if self.node_budget is not None and self.nodes > self.node_budget:
+            raise SolverBudgetExceeded()
+        spec = self.spec
+        size = spec.size
+
+        possible = (mask + spec.bottom_mask) & spec.board_mask
+        opponent_win = winning_positions(position ^ mask, mask, spec)
+        forced = possible & opponent_win
+        if forced:
+            # أكثر من تهديد فوري للخصم: خسارة أكيدة
+            if forced & (forced - 1):
+                return -((size - moves) // 2)
+            possible = forced
+        # لا نلعب تحت خانة يفوز فيها الخصم
+        possible &= ~(opponent_win >> 1)
+        if not possible:
+            return -((size - moves) // 2)
+
+        if moves >= size - 2:
+            return 0
+
+        low = -((size - 2 - moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+
+        high = (size - 1 - moves) // 2
+        key = position + mask
+        stored = self.table.get(key)
+        if stored is not None:
+            high = stored
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        # ترتيب الحركات: عدد التهديدات الجديدة، والتعادل بالقرب من المركز
+        candidates = []
+        for i, column in enumerate(self.column_masks):
+            move = possible & column
+            if move:
+                threats = winning_positions(position | move, mask | move, spec)
+                candidates.append((-bin(threats).count('1'), i, move))
+        candidates.sort()
+
+        opponent = position ^ mask
+        for _, _, move in candidates:
+            new_mask = mask | move
+            score = -self._negamax(opponent, new_mask, moves + 1, -beta, -alpha)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        if len(self.table) >= self.max_entries:
+            self.table.clear()
+        self.table[key] = alpha
+        return alpha
+
+    def solve_bitboard(self, board, weak=False):
+        """قيمة الموقع التامة لصاحب الدور (أو إشارتها فقط مع weak)"""
+        spec = self.spec
+        size = spec.size
+        position, mask, moves = board.current, board.mask, board.moves
+        possible = (mask + spec.bottom_mask) & spec.board_mask
+        if winning_positions(position, mask, spec) & possible:
+            return (size + 1 - moves) // 2
+
+        low = -((size - moves) // 2)
+        high = (size + 1 - moves) // 2
+        if weak:
+            low, high = -1, 1
+        # بحث ثنائي بنوافذ صفرية، يبدأ بالقرب من الصفر حيث تقع أغلب القيم
+        while low < high:
+            med = low + (high - low) // 2
+            if med <= 0 and low // 2 < med:
+                med = low // 2
+            elif med >= 0 and high // 2 > med:
+                med = high // 2
+            r = self._negamax(position, mask, moves, med, med + 1)
+            if r <= med:
+                high = r
+            else:
+                low = r
+        return low
+
+    def solve(self, game, weak=False, node_budget=None):
+        """قيمة الموقع التامة لصاحب الدور في game
+
+        node_budget يحد عدد العقد لهذا النداء ويرفع SolverBudgetExceeded عند تجاوزه.
+        """
+        self.nodes = 0
+        self.node_budget = node_budget
+        try:
+            return self.solve_bitboard(game.bitboard, weak)
+        finally:
+            self.node_budget = None
+
+    def analyze(self, game, node_budget=None):
+        """قيمة كل حركة ممكنة من منظور صاحب الدور: {العمود: القيمة}"""
+        self.nodes = 0
+        self.node_budget = node_budget
+        scores = {}
+        board = game.bitboard.copy()
+        try:
+            for col in self.column_order:
+                if not board.can_play(col):
+                    continue
+                if board.is_winning_move(col):
+                    scores[col] = (self.spec.size + 1 - board.moves) // 2
+                    continue
+                board.play(col)
+                scores[col] = -self.solve_bitboard(board)
+                board.switch()
+                board.undo(col)
+        finally:
+            self.node_budget = None
+        return scores
+
+    def outcome(self, score, moves):
+        """وصف القيمة: ("win" | "loss" | "draw"، عدد الحركات الكلي حتى نهاية اللعبة)"""
+        size = self.spec.size
+        if score == 0:
+            return "draw", size - moves
+        # الفائز هو صاحب الدور إذا كانت القيمة موجبة، واللاعب الأول يلعب الحركات الفردية
+        first_wins = (score > 0) == (moves % 2 == 0)
+        # الفوز في الحركة ply قيمته (size + 2 - ply) // 2، ومنها عدد أحجار الفائز
+        stones = (size + 3 if first_wins else size + 2) // 2 - abs(score)
+        plies = (2 * stones - 1 if first_wins else 2 * stones) - moves
+        return ("win" if score > 0 else "loss"), plies
@@ -0,0 +1,167 @@
+# transposition.py
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# نوع القيمة المخزنة
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable:
+    """جدول تبديل محدود الحجم مفهرس بمفتاح Zobrist
+
+    كل فهرس (bucket) فيه خانتان: الأولى تفضل العمق الأكبر والثانية تستبدل دائماً.
+    المفتاح الفريد للموقع يخزن مع كل مدخل للتحقق من التصادمات.
+    """
+
+    # تقدير تقريبي لحجم المدخل الواحد في الذاكرة (القوائم + كائنات الأعداد)
+    ENTRY_BYTES = 96
+
+    def __init__(self, size_mb=16):
+        buckets = max(1, int(size_mb * 1024 * 1024) // (2 * self.ENTRY_BYTES))
+        # أكبر قوة للعدد 2 لا تتجاوز الحد
+        self.buckets = 1 << (buckets.bit_length() - 1)
+        self._mask = self.buckets - 1
+        self.clear()
+
+    def clear(self):
+        n = 2 * self.buckets
+        self.keys = [None] * n
+        self.depths = [0] * n
+        self.values = [0] * n
+        self.flags = [EXACT] * n
+        self.moves = [None] * n
+        self.probes = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def probe(self, hash_key, key):
+        """يعيد (depth, value, flag, move) للموقع أو None"""
+        self.probes += 1
+        i = (hash_key & self._mask) << 1
+        keys = self.keys
+        for slot in (i, i + 1):
+            if keys[slot] == key:
+                self.hits += 1
+                return self.depths[slot], self.values[slot], self.flags[slot], self.moves[slot]
+        if keys[i] is not None or keys[i + 1] is not None:
+            # نفس الفهرس لكن موقع مختلف
+            self.collisions += 1
+        self.misses += 1
+        return None
+
+    def store(self, hash_key, key, depth, value, flag, move):
+        self.stores += 1
+        i = (hash_key & self._mask) << 1
+        keys = self.keys
+        if keys[i] is None or keys[i] == key or depth >= self.depths[i]:
+            slot = i
+        else:
+            slot = i + 1
+        keys[slot] = key
+        self.depths[slot] = depth
+        self.values[slot] = value
+        self.flags[slot] = flag
+        self.moves[slot] = move
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
+class SharedTranspositionTable:
+    """جدول تبديل في multiprocessing.shared_memory تشترك فيه عدة عمليات بدون أقفال
+
+    كل مدخل كلمتان 64 بت: (مفتاح التحقق XOR البيانات، البيانات). الكتابة
+    المتزامنة من عمليتين قد تخلط الكلمتين، فيفشل التحقق عند القراءة ويعامل
+    المدخل كأنه غير موجود. نفس واجهة TranspositionTable ونفس خانتي الاستبدال.
+    """
+
+    ENTRY_BYTES = 16
+    # تخطيط البيانات: القيمة (32 بت مزاحة)، العمق (8)، النوع (2)، الحركة + 1 (8)، بت الاستخدام
+    VALUE_OFFSET = 1 << 31
+    USED = 1 << 63
+
+    def __init__(self, size_mb=16, name=None):
+        entries = max(2, int(size_mb * 1024 * 1024) // self.ENTRY_BYTES)
+        self.buckets = 1 << ((entries // 2).bit_length() - 1)
+        self._mask = self.buckets - 1
+        size = 2 * self.buckets * self.ENTRY_BYTES
+        # name=None ينشئ ذاكرة جديدة، والاسم يربط عملية أخرى بنفس الجدول
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.name = self.shm.name
+        self.words = self.shm.buf.cast('Q')
+        if self.owner:
+            self.clear()
+        else:
+            self._reset_stats()
+
+    def __reduce__(self):
+        # العمليات الأخرى ترتبط بنفس الذاكرة بالاسم
+        return (SharedTranspositionTable, (2 * self.buckets * self.ENTRY_BYTES / (1024 * 1024), self.name))
+
+    def _reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def clear(self):
+        np.frombuffer(self.shm.buf, dtype=np.uint64)[:] = 0
+        self._reset_stats()
+
+    @staticmethod
+    def _verify_key(hash_key, key):
+        # المفتاح الفريد إذا اتسع لـ 64 بت، وإلا مفتاح Zobrist
+        return key if key >> 64 == 0 else hash_key
+
+    def probe(self, hash_key, key):
+        """يعيد (depth, value, flag, move) للموقع أو None"""
+        self.probes += 1
+        check = self._verify_key(hash_key, key)
+        words = self.words
+        i = (hash_key & self._mask) << 2
+        occupied = False
+        for w in (i, i + 2):
+            data = words[w + 1]
+            if data:
+                if words[w] ^ data == check:
+                    self.hits += 1
+                    move = (data >> 42) & 0xFF
+                    return ((data >> 32) & 0xFF, (data & 0xFFFFFFFF) - self.VALUE_OFFSET,
+                            (data >> 40) & 0x3, move - 1 if move else None)
+                occupied = True
+        if occupied:
+            self.collisions += 1
+        self.misses += 1
+        return None
+
+    def store(self, hash_key, key, depth, value, flag, move):
+        self.stores += 1
+        check = self._verify_key(hash_key, key)
+        words = self.words
+        i = (hash_key & self._mask) << 2
+        data = words[i + 1]
+        if not data or words[i] ^ data == check or depth >= (data >> 32) & 0xFF:
+            w = i
+        else:
+            w = i + 2
+        data = (self.USED | ((0 if move is None else move + 1) << 42) | (flag << 40)
+                | (min(depth, 0xFF) << 32) | (int(value) + self.VALUE_OFFSET))
+        words[w + 1] = data
+        words[w] = check ^ data
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def close(self):
+        """فك الارتباط بالذاكرة، وحذفها إذا كانت هذه العملية من أنشأها"""
+        try:
+            self.words.release()
+            self.shm.close()
+        finally:
+            if self.owner:
+                self.shm.unlink()